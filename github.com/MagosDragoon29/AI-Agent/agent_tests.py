@@ -0,0 +1,941 @@
+# agent_tests.py
+"""Behaviour tests for the agent's tool layer; run by tests.py next to the calculator tests."""
+
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import config
+import daemon
+import main as agent
+import backends
+from backends import FakeBackend
+from checkpoint import Checkpoint
+from functions.call_function import call_function
+from functions.file_info import SNIFF_BYTES, FileClassifier
+from functions.get_run_log import get_run_log
+from functions.prefetch import Prefetcher
+from functions.run_python_file import run_python_file
+from functions.search_code import search_code
+from functions.snapshot import WorkspaceSnapshot
+from functions.test_report import failure_block, parse_test_output
+from functions.walker import walk
+from functions.workspace import Workspace, all_workspaces, get_workspace
+from profiling import Profiler
+import router as router_module
+from router import Router
+
+
+def make_tree(root, files):
+    """Create {relative path: text} under root."""
+    for rel, text in files.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class TreeTestCase(unittest.TestCase):
+    """A fresh temporary tree and Workspace per test."""
+
+    files = {}
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        make_tree(self.root, self.files)
+        self.ws = Workspace(self.root)
+
+    def search(self, **kwargs):
+        return search_code(self.root, workspace=self.ws, **kwargs)
+
+
+class TestSearchCodeMultiPattern(TreeTestCase):
+    files = {
+        "pkg/calc.py": "def evaluate(x):\n    return apply(x)\n\n\ndef apply(x):\n    return x\n",
+        "pkg/render.py": "def render(x):\n    return str(x)\n",
+        "notes.txt": "evaluate later\n",
+    }
+
+    def test_one_walk_tags_matching_patterns(self):
+        results = self.search(extensions=[".py"], content_query=["def evaluate", "def render"])
+        by_path = {r["path"]: r for r in results}
+        self.assertEqual(set(by_path), {os.path.join("pkg", "calc.py"), os.path.join("pkg", "render.py")})
+        calc = by_path[os.path.join("pkg", "calc.py")]
+        self.assertEqual([(m["line_no"], m["patterns"]) for m in calc["matches"]], [(1, ["def evaluate"])])
+
+    def test_line_hit_by_several_patterns_lists_all(self):
+        results = self.search(extensions=[".py"], content_query=["apply", "return"])
+        calc = next(r for r in results if r["path"].endswith("calc.py"))
+        line2 = next(m for m in calc["matches"] if m["line_no"] == 2)
+        self.assertEqual(line2["patterns"], ["apply", "return"])
+
+    def test_single_query_has_no_patterns_field(self):
+        results = self.search(content_query="evaluate")
+        self.assertTrue(results)
+        self.assertTrue(all("patterns" not in m for r in results for m in r["matches"]))
+
+    def test_regex_patterns(self):
+        results = self.search(content_query=[r"^def \w+\(", r"str\("], use_regex=True, extensions=[".py"])
+        render = next(r for r in results if r["path"].endswith("render.py"))
+        self.assertEqual([m["line_no"] for m in render["matches"]], [1, 2])
+
+    def test_regex_with_inline_flags_and_groups(self):
+        results = self.search(content_query="(?i)DEF RENDER", use_regex=True)
+        self.assertEqual([r["path"] for r in results], [os.path.join("pkg", "render.py")])
+        results = self.search(content_query=["(?i)DEF RENDER", r"(?P<n>s)tr\((?P=n)?x", r"(r)etu\1n"],
+                              use_regex=True, extensions=[".py"])
+        render = next(r for r in results if r["path"].endswith("render.py"))
+        self.assertEqual([(m["line_no"], m["patterns"]) for m in render["matches"]],
+                         [(1, ["(?i)DEF RENDER"]), (2, [r"(?P<n>s)tr\((?P=n)?x", r"(r)etu\1n"])])
+        calc = next(r for r in results if r["path"].endswith("calc.py"))
+        self.assertEqual([m["line_no"] for m in calc["matches"]], [2, 6])
+
+
+class TestSearchCodeBudget(TreeTestCase):
+    files = {
+        f"m{i:02d}.py": "".join(f"x{j} = evaluate({j})  # {'pad ' * i}\n" for j in range(i + 3))
+        for i in range(20)
+    }
+
+    def test_payload_fits_budget_including_marker(self):
+        for budget in range(1_000, 12_000, 250):
+            results = self.search(content_query="evaluate", max_chars=budget)
+            self.assertLessEqual(len(json.dumps(results)), budget, budget)
+            self.assertIn("truncated", results[-1])
+
+    def test_lowest_scoring_files_are_trimmed_first(self):
+        full = self.search(content_query="evaluate", max_chars=10**9)
+        self.assertNotIn("truncated", full[-1])
+        trimmed = self.search(content_query="evaluate", max_chars=4_000)
+        marker = trimmed[-1]["truncated"]
+        kept = [r["path"] for r in trimmed[:-1]]
+        self.assertEqual(kept, [r["path"] for r in full[:len(kept)]])
+        self.assertEqual(marker["files_dropped"], [r["path"] for r in full[len(kept):]][::-1])
+        self.assertTrue(trimmed[0]["snippets"])
+
+    def test_overlapping_windows_merge(self):
+        results = self.search(content_query="evaluate", name_globs=["m02.py"], context_lines=2)
+        self.assertEqual([(s["start"], s["end"]) for s in results[0]["snippets"]], [(1, 5)])
+
+
+class TestWalker(TreeTestCase):
+    files = {
+        ".gitignore": "*.log\n!keep.log\n/build.txt\ncache/\n",
+        "a.py": "",
+        "debug.log": "",
+        "keep.log": "",
+        "build.txt": "",
+        "sub/build.txt": "",
+        "sub/cache/x.py": "",
+        "sub/cache.py": "",
+        "sub/.gitignore": "!debug.log\n",
+        "sub/debug.log": "",
+        "__pycache__/a.pyc": "",
+    }
+
+    def walked(self, **kwargs):
+        return sorted(
+            os.path.relpath(os.path.join(d, f), self.root)
+            for d, _, files in walk(self.root, **kwargs) for f in files
+        )
+
+    def test_gitignore_rules(self):
+        self.assertEqual(self.walked(), sorted([
+            ".gitignore", "a.py", "keep.log",
+            os.path.join("sub", ".gitignore"), os.path.join("sub", "build.txt"),
+            os.path.join("sub", "cache.py"), os.path.join("sub", "debug.log"),
+        ]))
+
+    def test_extra_ignores(self):
+        self.assertEqual(self.walked(extra_ignores=["sub"]), [".gitignore", "a.py", "keep.log"])
+
+    def test_rules_from_above_top_apply(self):
+        sub = os.path.join(self.root, "sub")
+        found = sorted(f for _, _, files in walk(sub, root=self.root) for f in files)
+        self.assertEqual(found, [".gitignore", "build.txt", "cache.py", "debug.log"])
+
+    def test_edited_gitignore_is_reloaded(self):
+        self.assertIn("a.py", self.walked())
+        with open(os.path.join(self.root, ".gitignore"), "a", encoding="utf-8") as f:
+            f.write("a.py\n")
+        self.assertNotIn("a.py", self.walked())
+
+
+class TestFileClassifier(TreeTestCase):
+    files = {"a.txt": "héllo\n"}
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, "a.txt")
+        self.files_cache = FileClassifier()
+
+    def write_bytes(self, data, mtime_ns=None):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_classification_is_cached(self):
+        info = self.files_cache.classify(self.path)
+        self.assertEqual((info["binary"], info["encoding"]), (False, "utf-8"))
+        self.assertIs(self.files_cache.classify(self.path), info)
+
+    def test_mtime_change_invalidates(self):
+        self.assertFalse(self.files_cache.classify(self.path)["binary"])
+        st = os.stat(self.path)
+        # same size, new contents and mtime
+        self.write_bytes(b"\x00" * st.st_size, st.st_mtime_ns + 1_000_000)
+        self.assertTrue(self.files_cache.classify(self.path)["binary"])
+        self.assertIsNone(self.files_cache.read_text(self.path))
+
+    def test_late_invalid_byte_keeps_utf8_text(self):
+        self.write_bytes("é".encode("utf-8") * (SNIFF_BYTES // 2 + 10) + b"\xff end\n")
+        text = self.files_cache.read_text(self.path)
+        self.assertTrue(text.startswith("éé"))
+        self.assertTrue(text.endswith("� end\n"))
+        self.assertEqual(self.files_cache.classify(self.path)["errors"], "replace")
+        self.assertEqual(self.files_cache.read_text(self.path), text)
+
+    def test_latin1_file(self):
+        self.write_bytes("café\n".encode("latin-1"))
+        self.assertEqual(self.files_cache.read_text(self.path), "café\n")
+
+    def test_max_bytes(self):
+        self.assertIsNone(self.files_cache.read_text(self.path, max_bytes=2))
+        self.assertEqual(self.files_cache.read_lines(self.path), ["héllo\n"])
+
+
+class TestPrefetcher(TreeTestCase):
+    files = {"a.txt": "é" * 300, "b.txt": "b" * 300, "c.txt": "c" * 300}
+
+    def setUp(self):
+        super().setUp()
+        self.paths = {n: os.path.join(self.root, n) for n in self.files}
+
+    def warm(self, prefetch, *names):
+        # schedule() runs _warm on a background thread; call it directly to stay deterministic
+        prefetch._warm([self.paths[n] for n in names])
+
+    def test_budget_counts_bytes_on_disk(self):
+        prefetch = Prefetcher(900, FileClassifier())
+        self.warm(prefetch, "a.txt", "b.txt")
+        # a.txt is 300 characters but 600 bytes
+        self.assertEqual(prefetch.stats()["resident_bytes"], 900)
+        self.warm(prefetch, "c.txt")
+        self.assertLessEqual(prefetch.stats()["resident_bytes"], 900)
+        self.assertIsNone(prefetch.get(self.paths["a.txt"]))
+        self.assertEqual(prefetch.get(self.paths["c.txt"]), "c" * 300)
+
+    def test_lookup_refreshes_lru_order(self):
+        prefetch = Prefetcher(1000, FileClassifier())
+        self.warm(prefetch, "a.txt", "b.txt")
+        prefetch.get(self.paths["a.txt"])
+        self.warm(prefetch, "c.txt")
+        self.assertIsNone(prefetch.get(self.paths["b.txt"]))
+        self.assertEqual(prefetch.get(self.paths["a.txt"]), "é" * 300)
+
+    def test_changed_file_is_a_miss(self):
+        prefetch = Prefetcher(1000, FileClassifier())
+        self.warm(prefetch, "b.txt")
+        with open(self.paths["b.txt"], "a", encoding="utf-8") as f:
+            f.write("more")
+        self.assertIsNone(prefetch.get(self.paths["b.txt"]))
+        self.assertEqual((prefetch.hits, prefetch.misses), (0, 1))
+
+    def test_discard(self):
+        prefetch = Prefetcher(1000, FileClassifier())
+        self.warm(prefetch, "a.txt")
+        prefetch.discard(self.paths["a.txt"])
+        self.assertEqual(prefetch.stats()["resident_bytes"], 0)
+
+
+def call_tool(workspace, name, **args):
+    """call_function with a stand-in FunctionCall, tool prints swallowed; returns the response payload."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        msg = call_function(SimpleNamespace(name=name, args=args), workspace=workspace)
+    return msg.parts[0].function_response.response
+
+
+class TestWorkspace(TreeTestCase):
+    files = {"pkg/calc.py": "def evaluate(x):\n    return x\n", "other/calc.py": "", "main.py": ""}
+
+    def test_fork_shares_caches_not_search_state(self):
+        a, b = self.ws.fork(), self.ws.fork()
+        call_tool(a, "search_code", name_globs=["calc.py"])
+        self.assertEqual(len(a.last_search_results), 2)
+        self.assertEqual(b.last_search_results, [])
+        self.assertIs(a.files, b.files)
+        self.assertIs(a.path_index(), b.path_index())
+
+    def test_basename_resolves_through_last_search(self):
+        session = self.ws.fork()
+        call_tool(session, "search_code", content_query="def evaluate")
+        payload = call_tool(session, "get_file_content", file_path="calc.py")
+        self.assertIn("def evaluate", payload["result"])
+
+    def test_write_file_updates_name_search(self):
+        session = self.ws.fork()
+        self.assertEqual(self.search(name_globs=["new*.py"]), [])
+        call_tool(session, "write_file", file_path="pkg/new_mod.py", contents="x = 1\n")
+        self.assertEqual([r["path"] for r in self.search(name_globs=["new*.py"])], [os.path.join("pkg", "new_mod.py")])
+
+    def test_forget_drops_only_named_files(self):
+        calc, main_py = (os.path.join(self.root, p) for p in ("pkg/calc.py", "main.py"))
+        self.ws.files.read_text(calc)
+        self.ws.files.read_text(main_py)
+        self.ws.forget([os.path.join("pkg", "calc.py")])
+        self.assertNotIn(calc, self.ws.files._cache)
+        self.assertIn(main_py, self.ws.files._cache)
+
+    def test_get_workspace_is_shared_and_bounded(self):
+        self.assertIs(get_workspace(self.root), get_workspace(self.root + os.sep))
+        roots = [tempfile.mkdtemp() for _ in range(config.MAX_WORKSPACES + 1)]
+        for r in roots:
+            self.addCleanup(shutil.rmtree, r, True)
+            get_workspace(r)
+        self.assertNotIn(os.path.abspath(roots[0]), [w.root for w in all_workspaces()])
+        self.assertLessEqual(len(all_workspaces()), config.MAX_WORKSPACES)
+
+
+class TestBackendArgs(unittest.TestCase):
+    def test_fake_and_script(self):
+        self.assertIsInstance(backends.backend_from_args(["main.py", "q", "--backend", "fake", "--verbose"]), FakeBackend)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump([{"text": "scripted"}], f)
+        self.addCleanup(os.remove, f.name)
+        backend = backends.backend_from_args(["main.py", "--batch", "b.jsonl", "--script", f.name, "--backend", "fake"])
+        self.assertEqual(backend.turns, [{"text": "scripted"}])
+
+    def test_unknown_backend_is_rejected(self):
+        with mock.patch.object(backends, "GeminiBackend") as gemini, contextlib.redirect_stderr(io.StringIO()) as err:
+            with self.assertRaises(SystemExit) as cm:
+                backends.backend_from_args(["main.py", "q", "--backend", "fkae"])
+        self.assertEqual(cm.exception.code, 2)
+        self.assertIn("invalid choice: 'fkae'", err.getvalue())
+        gemini.assert_not_called()
+
+    def test_gemini_is_the_default(self):
+        with mock.patch.object(backends, "GeminiBackend") as gemini, mock.patch.object(backends, "load_dotenv"):
+            backends.backend_from_args(["main.py", "q"])
+            backends.backend_from_args(["main.py", "q", "--backend", "gemini"])
+        self.assertEqual(gemini.call_count, 2)
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def generate(self, contents, config):
+        self.calls += 1
+        return super().generate(contents, config)
+
+
+def run_quietly(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return agent.run_session(*args, **kwargs)
+
+
+class TestRouter(TreeTestCase):
+    files = {
+        "pkg/calc.py": "class Calculator:\n    def evaluate(self, x):\n        return x\n",
+        "pkg/other.py": "def render(x):\n    return x\n\n\ndef helper():\n    pass\n",
+        "pkg/more.py": "def helper():\n    pass\n",
+        "lorem.txt": "lorem ipsum\n",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.router = Router()
+
+    def test_intents(self):
+        cases = {
+            "run main.py --fast": "run_file",
+            "list files in pkg": "list_files",
+            "show me the contents of lorem.txt": "read_file",
+            "where is Calculator.evaluate defined?": "where_defined",
+        }
+        for query, intent in cases.items():
+            self.assertEqual(self.router.match(query, self.ws).intent, intent, query)
+
+    def test_owner_must_be_the_exact_enclosing_class(self):
+        make_tree(self.root, {"pkg/calc2.py": "class Calc:\n    pass\n\n\ndef evaluate(x):\n    return x\n"})
+        self.assertEqual(router_module.find_definitions(self.ws, "Calculator.evaluate"), [(os.path.join("pkg", "calc.py"), 2)])
+        self.assertEqual(router_module.find_definitions(self.ws, "Calc.evaluate"), [])
+        self.assertIsNone(self.router.route("where is Calc.evaluate defined?", self.ws))
+        self.assertEqual(len(router_module.find_definitions(self.ws, "evaluate")), 2)
+
+    def test_router_is_opt_in(self):
+        backend = CountingBackend([{"text": "done"}])
+        outcome = run_quietly(backend, "list files", workspace=self.ws)
+        self.assertEqual((outcome["final"], backend.calls), ("done", 1))
+        for args, expected in ((["main.py", "list files"], None), (["main.py", "list files", "--router"], agent.DEFAULT_ROUTER)):
+            with mock.patch.object(sys, "argv", args + ["--backend", "fake"]), \
+                    mock.patch.object(agent, "run_session", return_value={"status": "ok", "final": "x"}) as run, \
+                    mock.patch.object(agent.Checkpoint, "create"), contextlib.redirect_stdout(io.StringIO()):
+                agent.main()
+            self.assertIs(run.call_args.kwargs["router"], expected)
+
+    def test_unrecognized_and_ambiguous_fall_through(self):
+        for query in ("refactor the calculator", "where is helper defined?", "where is nothing_here defined?"):
+            self.assertIsNone(self.router.route(query, self.ws), query)
+        self.assertEqual((self.router.hits, self.router.misses), (0, 3))
+
+    def test_routed_session_skips_the_model(self):
+        backend = CountingBackend()
+        outcome = run_quietly(backend, "where is render defined?", workspace=self.ws, router=self.router)
+        self.assertEqual(outcome["routed"], "where_defined")
+        self.assertIn(os.path.join("pkg", "other.py"), outcome["final"])
+        self.assertEqual(backend.calls, 0)
+        self.assertIsNone(self.router.stats()["est_saved_s"])
+
+    def test_unrouted_session_goes_to_the_model(self):
+        backend = CountingBackend([{"text": "done"}])
+        outcome = run_quietly(backend, "refactor the calculator", workspace=self.ws, router=self.router)
+        self.assertEqual((outcome["status"], outcome["final"], backend.calls), ("ok", "done", 1))
+        self.assertNotIn("routed", outcome)
+        self.assertEqual(self.router.stats()["misses"], 1)
+        self.assertIsNotNone(self.router.stats()["est_saved_s"])
+
+    def test_no_router_always_uses_the_model(self):
+        backend = CountingBackend([{"text": "done"}])
+        outcome = run_quietly(backend, "list files", workspace=self.ws, router=None)
+        self.assertEqual((outcome["final"], backend.calls), ("done", 1))
+
+    def test_batch_honours_router(self):
+        batch = os.path.join(self.root, "batch.jsonl")
+        with open(batch, "w", encoding="utf-8") as f:
+            f.write('"list files"\n')
+        out = os.path.join(self.root, "out.jsonl")
+        for router, calls in ((self.router, 0), (None, 1)):
+            backend = CountingBackend([{"text": "done"}])
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.run_batch(backend, batch, out, workspace=self.ws, router=router)
+            self.assertEqual(backend.calls, calls)
+
+
+class TestBatch(TreeTestCase):
+    def write_batch(self, *queries):
+        path = os.path.join(self.root, "batch.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(q) + "\n" for q in queries)
+        return path
+
+    def test_failed_session_keeps_the_record_schema(self):
+        real = agent.run_session
+
+        def run_session(backend, query, **kwargs):
+            if query == "boom":
+                raise RuntimeError("exploded")
+            return real(backend, query, **kwargs)
+
+        out = os.path.join(self.root, "out.jsonl")
+        with mock.patch.object(agent, "run_session", run_session), contextlib.redirect_stdout(io.StringIO()):
+            failures = agent.run_batch(FakeBackend([{"text": "done"}]), self.write_batch("fine", "boom"), out,
+                                       workspace=self.ws, router=None)
+        self.assertEqual(failures, 1)
+        with open(out, encoding="utf-8") as f:
+            records = {r["query"]: r for r in map(json.loads, f)}
+        self.assertEqual(set(records["boom"]), set(records["fine"]))
+        self.assertEqual((records["boom"]["status"], records["boom"]["tool_calls"]), ("error", 0))
+
+    def test_bad_concurrency_is_an_argument_error(self):
+        batch = self.write_batch("fine")
+        for value in (["0"], ["-2"], ["many"], []):
+            argv = ["main.py", "--batch", batch, "--backend", "fake", "--concurrency", *value]
+            stdout = io.StringIO()
+            with mock.patch.object(sys, "argv", argv), contextlib.redirect_stdout(stdout):
+                with self.assertRaises(SystemExit) as cm:
+                    agent.main()
+            self.assertEqual(cm.exception.code, 1)
+            self.assertIn("--concurrency needs a positive integer", stdout.getvalue())
+            self.assertNotIn("Bad batch file", stdout.getvalue())
+
+
+FAILING_SUITE = '''import unittest
+
+class T(unittest.TestCase):
+    def test_ok(self):
+        pass
+
+    def test_fail(self):
+        self.assertEqual(1, 2)
+
+    def test_error(self):
+        {}["missing"]
+
+    @unittest.skip("later")
+    def test_skip(self):
+        pass
+
+unittest.main()
+'''
+
+PYTEST_OUTPUT = """\
+============================= test session starts ==============================
+collected 3 items
+
+test_calc.py .F.                                                         [100%]
+
+=================================== FAILURES ===================================
+______________________________ TestCalc.test_add _______________________________
+
+    def test_add(self):
+>       assert add(1, 1) == 3
+E       assert 2 == 3
+
+test_calc.py:7: AssertionError
+=========================== short test summary info ============================
+FAILED test_calc.py::TestCalc::test_add - assert 2 == 3
+========================= 1 failed, 2 passed in 0.03s ==========================
+"""
+
+
+class TestStructuredRuns(TreeTestCase):
+    files = {"suite.py": FAILING_SUITE}
+
+    def setUp(self):
+        super().setUp()
+        logs = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logs, True)
+        patcher = mock.patch.object(config, "RUN_LOG_DIR", logs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unittest_summary_and_log(self):
+        summary = run_python_file(self.root, "suite.py", structured=True)
+        self.assertEqual(
+            {k: summary[k] for k in ("framework", "status", "passed", "failed", "errors", "skipped")},
+            {"framework": "unittest", "status": "FAILED", "passed": 1, "failed": 1, "errors": 1, "skipped": 1},
+        )
+        # 3.12 stopped counting skipped tests in "Ran N"
+        self.assertEqual(summary["ran"], 3 if sys.version_info >= (3, 12) else 4)
+        failures = {f["id"]: f for f in summary["failures"]}
+        self.assertEqual(set(failures), {"__main__.T.test_fail", "__main__.T.test_error"})
+        self.assertEqual(failures["__main__.T.test_fail"]["frame"], "suite.py:8 in test_fail")
+        self.assertEqual(failures["__main__.T.test_fail"]["message"], "AssertionError: 1 != 2")
+        self.assertEqual(failures["__main__.T.test_error"]["kind"], "error")
+
+        block = get_run_log(self.root, summary["run_id"], "__main__.T.test_error")
+        self.assertIn("KeyError: 'missing'", block)
+        self.assertNotIn("test_fail", block)
+        self.assertIn(f"Ran {summary['ran']} tests", get_run_log(self.root, summary["run_id"]))
+        self.assertTrue(get_run_log(self.root, summary["run_id"], "__main__.T.test_ok").startswith("Error:"))
+        self.assertTrue(get_run_log(self.root, "../etc/passwd").startswith("Error:"))
+
+    def test_stdout_then_stderr_once(self):
+        make_tree(self.root, {"noisy.py": 'print("before")\n' + FAILING_SUITE})
+        summary = run_python_file(self.root, "noisy.py", structured=True)
+        self.assertEqual(sorted(f["id"] for f in summary["failures"]), ["__main__.T.test_error", "__main__.T.test_fail"])
+        log = get_run_log(self.root, summary["run_id"])
+        self.assertTrue(log.startswith("before\n"))
+        self.assertEqual(log.count("Ran "), 1)
+
+    def test_pytest_output(self):
+        report = parse_test_output(PYTEST_OUTPUT)
+        self.assertEqual((report["framework"], report["ran"], report["passed"], report["failed"]), ("pytest", 3, 2, 1))
+        self.assertEqual(report["failures"], [{
+            "id": "test_calc.py::TestCalc::test_add", "kind": "fail",
+            "frame": "test_calc.py:7", "message": "assert 2 == 3",
+        }])
+        self.assertIn("assert add(1, 1) == 3", failure_block(PYTEST_OUTPUT, "test_calc.py::TestCalc::test_add"))
+
+    def test_plain_output_is_not_a_report(self):
+        self.assertIsNone(parse_test_output("hello\nworld\n"))
+
+
+class TestRunLimits(TreeTestCase):
+    files = {
+        "hog.py": "data = bytearray(512 * 1024 * 1024)\nprint('allocated')\n",
+        "spin.py": "while True:\n    pass\n",
+        "ok.py": "import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU)[0])\n",
+    }
+
+    def setUp(self):
+        super().setUp()
+        logs = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logs, True)
+        for name, value in (("RUN_LOG_DIR", logs), ("RUN_CPU_SECONDS", 1), ("RUN_MAX_MEMORY_BYTES", 256 * 1024 * 1024)):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_limits_are_in_place_when_the_script_starts(self):
+        self.assertEqual(run_python_file(self.root, "ok.py", structured=True)["tail"], "1")
+
+    def test_memory_limit(self):
+        summary = run_python_file(self.root, "hog.py", structured=True)
+        self.assertEqual(summary["exit_code"], 1)
+        self.assertIn("MemoryError", summary["tail"])
+        self.assertNotIn("allocated", summary["tail"])
+
+    def test_cpu_limit(self):
+        summary = run_python_file(self.root, "spin.py", structured=True)
+        self.assertEqual(summary["exit_code"], -signal.SIGXCPU)
+        self.assertNotIn("timed_out", summary)
+        self.assertGreaterEqual(summary["cpu_s"], 0.9)
+        self.assertIn("exit=-%d" % signal.SIGXCPU, run_python_file(self.root, "spin.py"))
+
+class TestCheckpoint(TreeTestCase):
+    files = {"pkg/calc.py": "def evaluate(x):\n    return x\n"}
+    # four tool steps, then an answer
+    script = [{"calls": [{"name": "get_files_info", "args": {"directory": "."}}]}] * 4 + [{"text": "all done"}]
+
+    def setUp(self):
+        super().setUp()
+        sessions = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, sessions, True)
+        for name, value in (("CHECKPOINT_DIR", sessions), ("MAX_ITERATIONS", 3)):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_session(self, backend, checkpoint):
+        return run_quietly(backend, checkpoint.query, workspace=self.ws, router=None, checkpoint=checkpoint)
+
+    def test_round_trip_and_resume(self):
+        first = Checkpoint.create("look around", self.root)
+        backend = CountingBackend(self.script)
+        outcome = self.run_session(backend, first)
+        self.assertEqual((outcome["status"], backend.calls), ("max_iterations", 3))
+
+        loaded = Checkpoint.load(first.session_id)
+        self.assertEqual((loaded.query, loaded.workspace_root), ("look around", self.root))
+        self.assertEqual((loaded.next_step, loaded.status), (3, "max_iterations"))
+        self.assertEqual(loaded.stats["tool_calls"], 3)
+        # the query plus one model turn per step
+        self.assertEqual([m.role for m in loaded.messages], ["user", "model", "model", "model"])
+        self.assertEqual([[t["name"] for t in step] for step in loaded.tool_results], [["get_files_info"]] * 3)
+        self.assertIn("result", loaded.tool_results[0][0]["response"])
+
+        outcome = self.run_session(backend, loaded)
+        self.assertEqual((outcome["status"], outcome["final"], outcome["tool_calls"]), ("ok", "all done", 4))
+        self.assertEqual(backend.calls, 5)
+        done = Checkpoint.load(first.session_id)
+        self.assertEqual((done.status, done.final, done.next_step), ("ok", "all done", 5))
+
+    def test_torn_line_is_truncated(self):
+        cp = Checkpoint.create("look around", self.root)
+        self.run_session(CountingBackend(self.script), cp)
+        with open(cp.path, "ab") as f:
+            f.write(b'{"step": 3, "messa')
+        loaded = Checkpoint.load(cp.session_id)
+        self.assertEqual(loaded.next_step, 3)
+        with open(cp.path, "rb") as f:
+            self.assertTrue(f.read().endswith(b"\n"))
+
+    def test_long_tool_results_are_cut_down(self):
+        make_tree(self.root, {"long.txt": "lorem ipsum\n" * 100})
+        cp = Checkpoint.create("read long.txt", self.root)
+        script = [{"calls": [{"name": "get_file_content", "args": {"file_path": "long.txt"}}]}]
+        with mock.patch.object(config, "CHECKPOINT_TOOL_RESULT_CHARS", 50):
+            self.run_session(CountingBackend(script), cp)
+        response = Checkpoint.load(cp.session_id).tool_results[0][0]["response"]
+        self.assertEqual(len(response["truncated"]), 50)
+        self.assertGreater(response["chars"], 50)
+
+    def test_written_only_once_the_model_is_called(self):
+        cp = Checkpoint.create("list files in pkg", self.root)
+        self.assertFalse(os.path.exists(cp.path))
+        router = Router()
+        outcome = run_quietly(CountingBackend([{"text": "unused"}]), cp.query, workspace=self.ws, router=router,
+                              checkpoint=cp)
+        self.assertEqual(outcome.get("routed"), "list_files")
+        self.assertFalse(os.path.exists(cp.path))
+        self.assertIsNone(Checkpoint.load(cp.session_id))
+
+    def test_unknown_session(self):
+        self.assertIsNone(Checkpoint.load("no-such-session"))
+
+    def test_checkpoint_write_error_is_not_a_generation_failure(self):
+        cp = Checkpoint.create("look around", self.root)
+        with mock.patch.object(Checkpoint, "_append", side_effect=OSError("disk full")):
+            with self.assertRaisesRegex(OSError, "disk full"):
+                self.run_session(CountingBackend([{"text": "all done"}]), cp)
+
+
+class TestPathIndex(TreeTestCase):
+    files = {
+        ".gitignore": "*.log\ngen/\n",
+        "a.py": "",
+        "Alpha_test.py": "",
+        "pkg/calc.py": "",
+        "pkg/calc_test.py": "",
+        "pkg/notes.md": "",
+        "pkg/gen/out.py": "",
+        "pkg/run.log": "",
+        "vendor/lib.py": "",
+    }
+
+    def walked(self, root=".", name_globs=(), extensions=(), extra_ignores=None):
+        top = os.path.join(self.root, root)
+        return sorted(
+            os.path.relpath(os.path.join(d, f), self.root)
+            for d, _, names in walk(top, root=self.root, extra_ignores=extra_ignores) for f in names
+            if (not extensions or os.path.splitext(f)[1] in extensions)
+            and (not name_globs or any(fnmatch.fnmatch(f, g) for g in name_globs))
+        )
+
+    def test_name_queries_match_a_walk(self):
+        for kwargs in (
+            {"extensions": [".py"]},
+            {"name_globs": ["*test*"]},
+            {"name_globs": ["calc*"], "extensions": [".py", ".md"]},
+            {"root": "pkg", "extensions": [".py"]},
+            {"extensions": [".py"], "extra_ignores": ["vendor"]},
+        ):
+            self.assertEqual(sorted(r["path"] for r in self.search(**kwargs)), self.walked(**kwargs), kwargs)
+
+    def test_scores(self):
+        results = self.search(name_globs=["*test*", "calc*"], extensions=[".py"])
+        self.assertEqual(results[0], {"path": os.path.join("pkg", "calc_test.py"), "score": 2.5, "matches": [], "snippets": []})
+
+    def test_ignored_root_is_walked(self):
+        self.assertFalse(self.ws.path_index().covers(os.path.join(self.root, "pkg", "gen")))
+        self.assertTrue(self.ws.path_index().covers(os.path.join(self.root, "pkg")))
+
+    def test_new_and_removed_files_after_invalidate(self):
+        self.assertEqual(len(self.search(extensions=[".py"])), 5)
+        make_tree(self.root, {"pkg/sub/new.py": ""})
+        os.remove(os.path.join(self.root, "a.py"))
+        self.ws.invalidate_paths()
+        paths = {r["path"] for r in self.search(extensions=[".py"])}
+        self.assertIn(os.path.join("pkg", "sub", "new.py"), paths)
+        self.assertNotIn("a.py", paths)
+
+    def test_removed_directory_after_invalidate(self):
+        self.search(extensions=[".py"])
+        shutil.rmtree(os.path.join(self.root, "vendor"))
+        self.ws.invalidate_paths()
+        self.assertNotIn(os.path.join("vendor", "lib.py"), {r["path"] for r in self.search(extensions=[".py"])})
+
+    def test_repeated_query_is_cached(self):
+        index = self.ws.path_index()
+        first = index.find(".", ["*.py"], [])
+        self.assertIs(index.find(".", ["*.py"], []), first)
+        make_tree(self.root, {"b.py": ""})
+        index.invalidate()
+        self.assertIsNot(index.find(".", ["*.py"], []), first)
+
+    def test_extra_ignores_apply_to_new_files(self):
+        self.search(extensions=[".py"], extra_ignores=["vendor"])
+        make_tree(self.root, {"vendor/more.py": "", "pkg/vendor/deep.py": "", "pkg/more.py": ""})
+        self.ws.invalidate_paths()
+        self.assertEqual(sorted(r["path"] for r in self.search(extensions=[".py"], extra_ignores=["vendor"])),
+                         self.walked(extensions=[".py"], extra_ignores=["vendor"]))
+        self.assertFalse(self.ws.path_index(["vendor"]).covers(os.path.join(self.root, "pkg", "vendor")))
+
+    def test_built_on_the_workspace_snapshot(self):
+        self.assertIs(self.ws.path_index().snapshot, self.ws.snapshot())
+        self.assertIs(self.ws.path_index(["vendor"]).snapshot, self.ws.snapshot())
+
+
+def bump_mtime(path):
+    """Move path's mtime forward so refresh() notices even on coarse filesystem clocks."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+class TestSnapshot(TreeTestCase):
+    files = {
+        ".gitignore": "*.log\n",
+        "a.py": "a = 1\n",
+        "pkg/b.py": "b = 2\n",
+        "pkg/run.log": "",
+        "pkg/sub/c.py": "",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.snap = WorkspaceSnapshot(self.root)
+
+    def assertMatchesFresh(self):
+        self.assertEqual(self.snap.root_hash, WorkspaceSnapshot(self.root).root_hash)
+
+    def test_noop_relist_keeps_root_hash(self):
+        before = self.snap.root_hash
+        bump_mtime(os.path.join(self.root, "pkg"))
+        generation = self.snap.generation
+        self.assertEqual(self.snap.refresh(), generation)
+        self.assertEqual(self.snap.root_hash, before)
+        self.assertMatchesFresh()
+
+    def test_noop_relist_then_change_elsewhere(self):
+        bump_mtime(os.path.join(self.root, "pkg"))
+        self.snap.refresh()
+        make_tree(self.root, {"new.py": ""})
+        bump_mtime(self.root)
+        self.snap.refresh()
+        self.assertMatchesFresh()
+
+    def test_added_file_and_ignored_file(self):
+        before = self.snap.root_hash
+        make_tree(self.root, {"pkg/sub/d.py": "", "pkg/sub/x.log": ""})
+        bump_mtime(os.path.join(self.root, "pkg", "sub"))
+        self.snap.refresh()
+        self.assertNotEqual(self.snap.root_hash, before)
+        self.assertEqual(self.snap.changed_since(0), [os.path.join("pkg", "sub", "d.py")])
+        self.assertMatchesFresh()
+
+    def test_empty_directories(self):
+        before = self.snap.root_hash
+        os.mkdir(os.path.join(self.root, "pkg", "empty"))
+        bump_mtime(os.path.join(self.root, "pkg"))
+        self.snap.refresh()
+        self.assertNotEqual(self.snap.root_hash, before)
+        self.assertMatchesFresh()
+        os.rmdir(os.path.join(self.root, "pkg", "empty"))
+        bump_mtime(os.path.join(self.root, "pkg"))
+        self.snap.refresh()
+        self.assertMatchesFresh()
+
+    def test_removed_directory(self):
+        shutil.rmtree(os.path.join(self.root, "pkg", "sub"))
+        bump_mtime(os.path.join(self.root, "pkg"))
+        self.snap.refresh()
+        self.assertEqual(self.snap.changed_since(0), [os.path.join("pkg", "sub", "c.py")])
+        self.assertFalse(self.snap.has_dir(os.path.join(self.root, "pkg", "sub")))
+        self.assertMatchesFresh()
+
+    def test_in_place_edit_needs_verify(self):
+        path = os.path.join(self.root, "pkg", "b.py")
+        with open(path, "a") as f:
+            f.write("c = 3\n")
+        bump_mtime(path)
+        self.snap.refresh()
+        self.assertEqual(self.snap.generation, 0)
+        self.snap.verify()
+        self.assertEqual(self.snap.changed_since(0), [os.path.join("pkg", "b.py")])
+        self.assertMatchesFresh()
+
+    def test_note_write(self):
+        make_tree(self.root, {"pkg/new.py": "x = 1\n"})
+        self.snap.note_write(os.path.join(self.root, "pkg", "new.py"))
+        self.assertEqual(self.snap.changed_since(0), [os.path.join("pkg", "new.py")])
+        self.assertMatchesFresh()
+        # the directory is still re-listed later, which finds nothing new
+        bump_mtime(os.path.join(self.root, "pkg"))
+        self.assertEqual(self.snap.refresh(), 1)
+        self.assertMatchesFresh()
+
+    def test_files(self):
+        self.assertEqual(sorted(self.snap.files()), sorted(["a.py", ".gitignore", os.path.join("pkg", "b.py"),
+                                                           os.path.join("pkg", "sub", "c.py")]))
+        self.assertEqual(self.snap.files(["a.py", "gone.py", os.path.join("pkg", "run.log")]), ["a.py"])
+
+    def test_changed_since_beyond_history(self):
+        with mock.patch.object(config, "SNAPSHOT_HISTORY", 1):
+            snap = WorkspaceSnapshot(self.root)
+        for name in ("x.py", "y.py"):
+            make_tree(self.root, {name: ""})
+            snap.note_write(os.path.join(self.root, name))
+        self.assertEqual(snap.changed_since(1), ["y.py"])
+        self.assertIsNone(snap.changed_since(0))
+        self.assertEqual(snap.changed_since(snap.generation), [])
+
+
+class TestProfiler(TreeTestCase):
+    files = {"pkg/calc.py": "def evaluate(x):\n    return x\n"}
+    script = [{"calls": [{"name": "get_files_info", "args": {"directory": "."}}]}, {"text": "done"}]
+
+    def setUp(self):
+        super().setUp()
+        self.out = os.path.join(self.root, "profile")
+
+    def run_profiled(self):
+        profiler = Profiler(self.out)
+        outcome = run_quietly(FakeBackend(self.script), "look around", workspace=self.ws, router=None, profiler=profiler)
+        self.assertEqual(outcome["status"], "ok")
+        return profiler.write_report()
+
+    def test_report_files(self):
+        self.assertIn("model", self.run_profiled())
+        names = os.listdir(self.out)
+        self.assertEqual(sorted(n for n in names if n.endswith(".pstats")),
+                         ["00-model-0.pstats", "01-tool-get_files_info.pstats", "02-model-1.pstats"])
+        for name in names:
+            self.assertGreater(os.path.getsize(os.path.join(self.out, name)), 0, name)
+        self.assertIn("allocations.txt", names)
+        self.assertIn("summary.txt", names)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_leaves_existing_tracing_on(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        self.run_profiled()
+        self.assertTrue(tracemalloc.is_tracing())
+
+
+class _Polls:
+    """Stand-in for the watcher's stop event: lets `n` polls through, then stops."""
+
+    def __init__(self, n):
+        self.n = n
+
+    def wait(self, interval):
+        self.n -= 1
+        return self.n < 0
+
+
+class TestWatcher(TreeTestCase):
+    files = {"a.py": "a = 1\n", "pkg/b.py": "b = 2\n"}
+
+    def warm(self, ws):
+        ws.snapshot()
+        ws.files.classify(os.path.join(ws.root, "a.py"))
+        self.assertTrue(ws.path_index().covers(ws.root))
+
+    def test_deleted_root(self):
+        self.warm(self.ws)
+        shutil.rmtree(self.root)
+        for verify in (False, True):
+            with contextlib.redirect_stderr(io.StringIO()):
+                daemon._check(self.ws, verify)
+        self.assertEqual(self.ws.snapshot().root_hash, "")
+        self.assertEqual(self.ws.files._cache, {})
+        self.ws.invalidate_paths()
+        self.assertFalse(self.ws.path_index().covers(self.root))
+
+    def test_error_clears_that_workspace_and_keeps_polling(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other, True)
+        make_tree(other, self.files)
+        good = Workspace(other)
+        self.warm(self.ws)
+        self.warm(good)
+        with open(os.path.join(other, "a.py"), "a") as f:
+            f.write("more = 2\n")
+        bump_mtime(os.path.join(other, "a.py"))
+
+        real = WorkspaceSnapshot.refresh
+
+        def refresh(snapshot):
+            if snapshot.root == self.ws.root:
+                raise PermissionError("denied")
+            return real(snapshot)
+
+        with mock.patch.object(WorkspaceSnapshot, "refresh", refresh), \
+                mock.patch.object(daemon, "all_workspaces", return_value=[self.ws, good]), \
+                mock.patch.object(config, "SNAPSHOT_VERIFY_EVERY", 2), \
+                contextlib.redirect_stderr(io.StringIO()) as err:
+            daemon._watch(0, _Polls(3))
+        self.assertEqual(err.getvalue().count("PermissionError: denied; caches cleared"), 3)
+        self.assertEqual(self.ws.files._cache, {})
+        # the verify on the second poll still ran for the healthy workspace
+        self.assertNotIn(os.path.join(other, "a.py"), good.files._cache)
+        self.assertEqual(good.snapshot().changed_since(0), ["a.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# backends.py
+"""
+Model backends for the agent loop.
+
+run_session only needs `backend.generate(contents, config)` returning something shaped like
+genai's GenerateContentResponse (.candidates, .function_calls, .text, .usage_metadata).
+GeminiBackend is the real thing; FakeBackend replays a script locally for load testing.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+import config
+
+
+class ModelBackend(ABC):
+    @abstractmethod
+    def generate(self, contents, config):
+        """One model round trip for contents under a GenerateContentConfig."""
+
+
+class GeminiBackend(ModelBackend):
+    def __init__(self, api_key=None, model=config.MODEL_NAME, client=None):
+        self.client = client or genai.Client(api_key=api_key)
+        self.model = model
+
+    def generate(self, contents, config):
+        return self.client.models.generate_content(model=self.model, contents=contents, config=config)
+
+
+class FakeBackendError(Exception):
+    pass
+
+
+# search -> read -> answer: the common "find X" trajectory
+DEFAULT_SCRIPT = [
+    {"calls": [{"name": "schema_search_code", "args": {"content_query": "def evaluate", "extensions": [".py"]}}]},
+    {"calls": [{"name": "schema_get_file_content", "args": {"path": "pkg/calculator.py"}}]},
+    {"text": "Calculator.evaluate is defined in pkg/calculator.py."},
+]
+
+
+class FakeBackend(ModelBackend):
+    """
+    Replays scripted model turns. Each turn is {"text": "..."} or
+    {"calls": [{"name": ..., "args": {...}}, ...]}; the turn served is picked by how many
+    model turns are already in `contents`, so one instance can serve many sessions at once.
+    Once the script runs out the last turn is repeated.
+
+    latency: seconds per call, or [min, max] for a uniform range
+    unavailable_rate: probability of raising a 503 UNAVAILABLE (retried by run_session)
+    error_rate: probability of raising a non-retryable error
+    """
+
+    def __init__(self, turns=None, latency=0.0, unavailable_rate=0.0, error_rate=0.0, seed=None):
+        self.turns = turns or DEFAULT_SCRIPT
+        self.latency = latency
+        self.unavailable_rate = unavailable_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        """Load {"turns": [...], "latency": ..., "unavailable_rate": ..., "error_rate": ..., "seed": ...}."""
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        if isinstance(spec, list):
+            spec = {"turns": spec}
+        return cls(**spec)
+
+    def _draw(self):
+        with self._lock:
+            roll = self._rng.random()
+            if isinstance(self.latency, (list, tuple)):
+                delay = self._rng.uniform(*self.latency)
+            else:
+                delay = self.latency
+        return roll, delay
+
+    def generate(self, contents, config):
+        roll, delay = self._draw()
+        if delay:
+            time.sleep(delay)
+        if roll < self.unavailable_rate:
+            raise FakeBackendError("503 UNAVAILABLE: injected overload")
+        if roll < self.unavailable_rate + self.error_rate:
+            raise FakeBackendError("500 INTERNAL: injected failure")
+
+        step = sum(1 for c in contents if getattr(c, "role", None) == "model")
+        turn = self.turns[min(step, len(self.turns) - 1)]
+        if "calls" in turn:
+            parts = [
+                types.Part(function_call=types.FunctionCall(name=c["name"], args=c.get("args", {})))
+                for c in turn["calls"]
+            ]
+        else:
+            parts = [types.Part.from_text(text=turn.get("text", ""))]
+
+        prompt_chars = sum(len(p.text or "") for c in contents for p in (c.parts or []))
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4,
+                candidates_token_count=len(json.dumps(turn)) // 4,
+            ),
+        )
+
+
+# only the backend flags; everything else on the command line belongs to main.py / daemon.py
+_BACKEND_ARGS = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+_BACKEND_ARGS.add_argument("--backend", choices=("fake", "gemini"), default="gemini")
+_BACKEND_ARGS.add_argument("--script", help="FakeBackend script (--backend fake only)")
+
+
+def backend_from_args(args) -> ModelBackend:
+    """
+    --backend fake [--script turns.json] selects FakeBackend, --backend gemini (the default)
+    the live API. Any other --backend value is a usage error, so a typo never spends quota.
+    """
+    opts, _ = _BACKEND_ARGS.parse_known_args(args[1:])
+    if opts.backend == "fake":
+        if opts.script:
+            return FakeBackend.from_file(opts.script)
+        return FakeBackend()
+    load_dotenv("aiconfig.env")
+    return GeminiBackend(api_key=os.environ.get("GEMINI_API_KEY"))
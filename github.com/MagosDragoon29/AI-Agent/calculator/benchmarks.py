@@ -0,0 +1,262 @@
+# benchmarks.py
+"""
+Benchmarks for Calculator.
+
+Peak memory on a single very large expression:
+    python benchmarks.py [terms ...]
+
+Each variant runs in a fresh interpreter so its peak RSS is not polluted by the others:
+  legacy  - the original list-of-tokens / list-of-floats evaluator
+  string  - Calculator.evaluate on the whole expression string
+  stream  - Calculator.evaluate_stream reading the expression from the file
+
+Throughput of evaluate, _evaluate_infix and render over many small expressions:
+    python benchmarks.py --throughput [--repeat N] [--baseline FILE] [--save-baseline] [--threshold 0.25]
+
+Reports evaluations/sec and ns per token (median of N samples of at least 0.2s each), per-call
+peak traced memory and blocks left allocated (tracemalloc) for each expression shape. With a saved baseline (default
+benchmark_baseline.json, written by --save-baseline) it exits 1 if any case is slower, or
+allocates more, than the baseline by more than the threshold, and exits 3 (gate skipped, said
+so on stdout) if there is no baseline to compare with. Baselines are machine-specific and not
+checked in.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import statistics
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from pkg.calculator import Calculator
+from pkg.render import render
+
+VARIANTS = ("legacy", "string", "stream")
+DEFAULT_TERMS = (100_000, 1_000_000)
+
+# (name, operands per expression, operator mix)
+THROUGHPUT_CASES = (
+    ("short-add", 2, "+-"),
+    ("short-mix", 4, "+-*/"),
+    ("medium-mul", 25, "*/"),
+    ("medium-mix", 25, "+-*/"),
+    ("long-mix", 250, "+-*/"),
+)
+EXPRESSIONS_PER_CASE = 200
+DEFAULT_REPEAT = 5
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+# --throughput exit status when there is no baseline: neither a pass (0) nor a regression (1)
+EXIT_NO_BASELINE = 3
+# allocation differences below these are noise, not regressions
+ALLOC_SLACK_BYTES = 256
+RETAINED_SLACK_BLOCKS = 10
+
+
+def _expression_parts(rng, terms, ops):
+    yield str(rng.randint(1, 9))
+    for _ in range(terms - 1):
+        yield f" {rng.choice(ops)} {rng.randint(1, 9)}"
+
+
+def write_expression(path, terms, ops="+-*/", seed=0):
+    """Write a left-associative chain of `terms` operands to path without building it in memory."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for part in _expression_parts(rng, terms, ops):
+            f.write(part)
+        f.write("\n")
+
+
+def make_expressions(terms, ops, count=EXPRESSIONS_PER_CASE, seed=0):
+    rng = random.Random(seed)
+    return ["".join(_expression_parts(rng, terms, ops)) for _ in range(count)]
+
+
+def legacy_evaluate(calculator, expression):
+    tokens = expression.strip().split()
+    values = []
+    operators = []
+    for token in tokens:
+        if token in calculator.operators:
+            while operators and calculator.precedence[operators[-1]] >= calculator.precedence[token]:
+                calculator._apply_operator(operators, values)
+            operators.append(token)
+        else:
+            values.append(float(token))
+    while operators:
+        calculator._apply_operator(operators, values)
+    return values[0]
+
+
+def _run_variant(variant, path):
+    calculator = Calculator()
+    start = time.perf_counter()
+    if variant == "stream":
+        with open(path) as f:
+            calculator.evaluate_stream(f)
+    else:
+        with open(path) as f:
+            expression = f.read()
+        if variant == "legacy":
+            legacy_evaluate(calculator, expression)
+        else:
+            calculator.evaluate(expression)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{peak_kib} {elapsed:.4f}")
+
+
+def measure(variant, path):
+    cp = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", variant, path],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    peak_kib, elapsed = cp.stdout.split()
+    return int(peak_kib), float(elapsed)
+
+
+def _median_pass(fn, items, repeat):
+    """
+    Median seconds per pass of fn over items. Each of the `repeat` samples loops enough passes
+    to run for at least 0.2s (timeit.Timer.autorange), so a single scheduler hiccup or timer
+    tick cannot swing the result the way one ~1ms pass can.
+    """
+    def one_pass():
+        for item in items:
+            fn(item)
+
+    timer = timeit.Timer(one_pass)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(repeat, number)) / number
+
+
+def _allocations(fn, items):
+    """(mean per-call peak traced bytes, blocks still allocated after the pass)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        peaks = 0
+        for item in items:
+            tracemalloc.reset_peak()
+            floor = tracemalloc.get_traced_memory()[0]
+            fn(item)
+            peaks += tracemalloc.get_traced_memory()[1] - floor
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(max(s.count_diff, 0) for s in after.compare_to(before, "lineno")
+                   if s.traceback[0].filename != tracemalloc.__file__)
+    return peaks / len(items), retained
+
+
+def run_throughput(repeat=DEFAULT_REPEAT):
+    """{"target/case": {"evals_per_sec", "ns_per_token", "peak_bytes", "retained_blocks"}}"""
+    calculator = Calculator()
+    results = {}
+    for name, terms, ops in THROUGHPUT_CASES:
+        expressions = make_expressions(terms, ops)
+        token_lists = [e.split() for e in expressions]
+        rendered = [(e, calculator.evaluate(e)) for e in expressions]
+        tokens = sum(len(t) for t in token_lists)
+        targets = (
+            ("evaluate", calculator.evaluate, expressions),
+            ("_evaluate_infix", calculator._evaluate_infix, token_lists),
+            ("render", lambda pair: render(*pair), rendered),
+        )
+        for target, fn, items in targets:
+            elapsed = _median_pass(fn, items, repeat)
+            peak, retained = _allocations(fn, items)
+            results[f"{target}/{name}"] = {
+                "evals_per_sec": round(len(items) / elapsed, 1),
+                "ns_per_token": round(elapsed / tokens * 1e9, 1),
+                "peak_bytes": round(peak, 1),
+                "retained_blocks": retained,
+            }
+    return results
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Human-readable regressions of current against baseline; empty if none."""
+    regressions = []
+    for key, now in current.items():
+        then = baseline.get(key)
+        if not then:
+            continue
+        if now["evals_per_sec"] < then["evals_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{key}: {now['evals_per_sec']:.0f} evals/s vs baseline {then['evals_per_sec']:.0f} "
+                f"({now['evals_per_sec'] / then['evals_per_sec'] - 1:+.0%})"
+            )
+        if now["peak_bytes"] > then["peak_bytes"] * (1 + threshold) + ALLOC_SLACK_BYTES:
+            regressions.append(f"{key}: peak {now['peak_bytes']:.0f} B/call vs baseline {then['peak_bytes']:.0f}")
+        if now["retained_blocks"] > then["retained_blocks"] * (1 + threshold) + RETAINED_SLACK_BLOCKS:
+            regressions.append(f"{key}: {now['retained_blocks']} blocks retained vs baseline {then['retained_blocks']}")
+    return regressions
+
+
+def throughput_main(args):
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else DEFAULT_REPEAT
+    baseline_path = args[args.index("--baseline") + 1] if "--baseline" in args else BASELINE_FILE
+    threshold = float(args[args.index("--threshold") + 1]) if "--threshold" in args else DEFAULT_THRESHOLD
+
+    results = run_throughput(repeat)
+    print(f"{'case':<28}  {'evals/s':>10}  {'ns/token':>9}  {'peak B/call':>11}  {'retained':>8}")
+    for key, r in results.items():
+        print(f"{key:<28}  {r['evals_per_sec']:>10.0f}  {r['ns_per_token']:>9.1f}  "
+              f"{r['peak_bytes']:>11.0f}  {r['retained_blocks']:>8}")
+
+    if "--save-baseline" in args:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print(f"No baseline at {baseline_path}: regression gate skipped "
+              f"(run with --save-baseline to create one)")
+        return EXIT_NO_BASELINE
+
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"Regressions beyond {threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"No regressions beyond {threshold:.0%} against {baseline_path}")
+    return 0
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _run_variant(sys.argv[2], sys.argv[3])
+        return
+    if "--throughput" in sys.argv:
+        sys.exit(throughput_main(sys.argv))
+
+    sizes = [int(a) for a in sys.argv[1:]] or list(DEFAULT_TERMS)
+    print(f"{'terms':>10}  {'variant':<7}  {'peak RSS':>10}  {'time':>8}")
+    for terms in sizes:
+        fd, path = tempfile.mkstemp(suffix=".expr")
+        os.close(fd)
+        try:
+            write_expression(path, terms)
+            for variant in VARIANTS:
+                peak_kib, elapsed = measure(variant, path)
+                print(f"{terms:>10}  {variant:<7}  {peak_kib / 1024:>8.1f}MB  {elapsed:>7.3f}s")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
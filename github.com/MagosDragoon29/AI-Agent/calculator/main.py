@@ -3,6 +3,7 @@
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
+from pkg.parallel import evaluate_file
 
 
 def main():
@@ -10,9 +11,27 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print("       python main.py --file <expressions.txt> [--workers N]")
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1] == "--file":
+        if len(sys.argv) < 3:
+            print("Error: --file requires a path")
+            return
+        workers = None
+        if "--workers" in sys.argv:
+            try:
+                workers = int(sys.argv[sys.argv.index("--workers") + 1])
+            except (IndexError, ValueError):
+                print("Error: --workers requires an integer")
+                return
+        try:
+            evaluate_file(sys.argv[2], workers=workers)
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
@@ -23,4 +42,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,4 +1,13 @@
 # pkg/calculator.py
+import re
+from array import array
+from itertools import chain
+
+_TOKEN_RE = re.compile(r"\S+")
+# above this length, tokens are produced lazily instead of via str.split()
+_SPLIT_LIMIT = 1 << 16
+
+
 class Calculator:
     def __init__(self):
         self.operators = {
@@ -8,7 +17,7 @@ class Calculator:
             "/": lambda a, b: a / b,
         }
         self.precedence = {
-            "+": 1,   
+            "+": 1,
             "-": 1,
             "*": 2,
             "/": 2,
@@ -17,11 +26,40 @@ class Calculator:
     def evaluate(self, expression):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
+        if len(expression) <= _SPLIT_LIMIT:
+            tokens = expression.split()
+        else:
+            tokens = (m.group() for m in _TOKEN_RE.finditer(expression))
         return self._evaluate_infix(tokens)
 
+    def evaluate_stream(self, stream, chunk_size=65536):
+        """Evaluate one expression read incrementally from a text file-like object."""
+        tokens = self._tokenize_stream(stream, chunk_size)
+        first = next(tokens, None)
+        if first is None:
+            return None
+        return self._evaluate_infix(chain((first,), tokens))
+
+    def _tokenize_stream(self, stream, chunk_size):
+        tail = ""
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            data = tail + chunk
+            parts = data.split()
+            # a chunk can end mid-token; carry the partial token into the next read
+            if parts and not data[-1].isspace():
+                tail = parts.pop()
+            else:
+                tail = ""
+            yield from parts
+        if tail:
+            yield tail
+
     def _evaluate_infix(self, tokens):
-        values = []
+        # unboxed doubles; for left-associative chains both stacks stay a few entries deep
+        values = array("d")
         operators = []
 
         for token in tokens:
@@ -0,0 +1,82 @@
+# pkg/parallel.py
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool
+
+from pkg.calculator import Calculator
+from pkg.render import format_result
+
+CHUNK_BYTES = 4 * 1024 * 1024
+
+_calculator = None
+
+
+def split_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Yield (start, end) byte ranges covering path, each ending on a line boundary."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                # extend to the end of the line we landed in
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            yield start, end
+            start = end
+
+
+def _init_worker():
+    global _calculator
+    _calculator = Calculator()
+
+
+def _evaluate_chunk(task):
+    path, start, end = task
+    calculator = _calculator or Calculator()
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    out = []
+    for line in data.decode("utf-8").splitlines():
+        expression = line.strip()
+        if not expression:
+            continue
+        try:
+            out.append(format_result(calculator.evaluate(expression)))
+        except Exception as e:
+            out.append(f"Error: {e}")
+    return "\n".join(out)
+
+
+def _write(out, text):
+    if text:
+        out.write(text)
+        out.write("\n")
+
+
+def evaluate_file(path, workers=None, out=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Evaluate one expression per line of path, writing one result per line to out.
+    Chunks are evaluated in worker processes and written back in input order;
+    at most 2 * workers chunks are in flight, so memory stays bounded.
+    """
+    out = out or sys.stdout
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for start, end in split_chunks(path, chunk_bytes):
+            _write(out, _evaluate_chunk((path, start, end)))
+        return
+
+    with Pool(workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for start, end in split_chunks(path, chunk_bytes):
+            pending.append(pool.apply_async(_evaluate_chunk, ((path, start, end),)))
+            if len(pending) >= workers * 2:
+                _write(out, pending.popleft().get())
+        while pending:
+            _write(out, pending.popleft().get())
@@ -1,7 +1,15 @@
 # tests.py
 
+import contextlib
+import io
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import benchmarks
 from pkg.calculator import Calculator
+from pkg.parallel import evaluate_file, split_chunks
 
 
 class TestCalculator(unittest.TestCase):
@@ -44,7 +52,76 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_stream_matches_string(self):
+        expression = " + ".join(str(i) for i in range(1, 500)) + " * 2 - 7 / 7"
+        stream = io.StringIO(expression)
+        self.assertEqual(
+            self.calculator.evaluate_stream(stream, chunk_size=7),
+            self.calculator.evaluate(expression),
+        )
+
+    def test_stream_empty(self):
+        self.assertIsNone(self.calculator.evaluate_stream(io.StringIO("  \n")))
+
     print("Ran 9 tests")
 
+
+class TestParallelFile(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        lines = [f"{i} * 2 + 1" for i in range(200)] + ["", "$ 3 5", "10 / 4"]
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_align_on_newlines(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        chunks = list(split_chunks(self.path, chunk_bytes=64))
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(data))
+        for start, end in chunks:
+            self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_parallel_matches_serial_order(self):
+        serial, parallel = io.StringIO(), io.StringIO()
+        evaluate_file(self.path, workers=1, out=serial, chunk_bytes=64)
+        evaluate_file(self.path, workers=2, out=parallel, chunk_bytes=64)
+        self.assertEqual(serial.getvalue(), parallel.getvalue())
+        out = serial.getvalue().splitlines()
+        self.assertEqual(out[:3], ["1", "3", "5"])
+        self.assertEqual(out[-2:], ["Error: invalid token: $", "2.5"])
+
+class TestBenchmarkGate(unittest.TestCase):
+    baseline = {"evaluate/short-add": {"evals_per_sec": 1000.0, "ns_per_token": 100.0, "peak_bytes": 1000.0, "retained_blocks": 20}}
+
+    def current(self, **changes):
+        return {"evaluate/short-add": {**self.baseline["evaluate/short-add"], **changes}}
+
+    def test_within_threshold(self):
+        for changes in ({}, {"evals_per_sec": 760.0}, {"evals_per_sec": 5000.0}, {"peak_bytes": 1500.0}, {"retained_blocks": 35}):
+            self.assertEqual(benchmarks.compare(self.current(**changes), self.baseline, 0.25), [], changes)
+
+    def test_beyond_threshold(self):
+        for changes, text in (({"evals_per_sec": 740.0}, "evals/s"), ({"peak_bytes": 1600.0}, "peak"),
+                              ({"retained_blocks": 36}, "retained")):
+            regressions = benchmarks.compare(self.current(**changes), self.baseline, 0.25)
+            self.assertEqual(len(regressions), 1, changes)
+            self.assertIn(text, regressions[0])
+
+    def test_cases_missing_from_the_baseline_are_skipped(self):
+        self.assertEqual(benchmarks.compare({"render/new": self.current()["evaluate/short-add"]}, self.baseline), [])
+
+    def test_missing_baseline_skips_the_gate_loudly(self):
+        missing = os.path.join(tempfile.mkdtemp(), "none.json")
+        out = io.StringIO()
+        with mock.patch.object(benchmarks, "run_throughput", return_value=self.current()), contextlib.redirect_stdout(out):
+            code = benchmarks.throughput_main(["benchmarks.py", "--throughput", "--baseline", missing])
+        self.assertEqual(code, benchmarks.EXIT_NO_BASELINE)
+        self.assertIn("regression gate skipped", out.getvalue())
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+# checkpoint.py
+"""
+Durable per-session checkpoints so an interrupted run can pick up where it stopped
+(python main.py --resume <session>).
+
+One append-only JSONL file per session under config.CHECKPOINT_DIR:
+    {"session": id, "query": ..., "workspace": root, "created": ts}        header
+    {"step": i, "messages": [...], "tools": [...], "stats": {...}}         one per completed step
+    {"end": status, "final": text}                                          when the session returns
+Each step only appends what it added and is fsynced, so writing stays cheap as history grows
+and a crash loses at most the step in flight. "tools" holds {"name", "args", "response"} per
+tool call, with responses longer than config.CHECKPOINT_TOOL_RESULT_CHARS cut down.
+The file, header included, is only written with the first step or end record, so sessions
+answered without the model (see router.py) leave nothing behind.
+"""
+import json
+import os
+import secrets
+import time
+
+from google.genai import types
+
+import config
+
+
+def _dir():
+    return os.path.expanduser(config.CHECKPOINT_DIR)
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":"), default=str)
+
+
+def _prune():
+    # ids sort by creation time; keep the newest config.CHECKPOINT_KEEP
+    files = sorted(n for n in os.listdir(_dir()) if n.endswith(".jsonl"))
+    for name in files[:-config.CHECKPOINT_KEEP]:
+        try:
+            os.remove(os.path.join(_dir(), name))
+        except OSError:
+            pass
+
+
+def _compact(response):
+    """response as is if it serializes within config.CHECKPOINT_TOOL_RESULT_CHARS, else its cut-down text."""
+    text = _dumps(response)
+    if len(text) <= config.CHECKPOINT_TOOL_RESULT_CHARS:
+        return response
+    return {"truncated": text[:config.CHECKPOINT_TOOL_RESULT_CHARS], "chars": len(text)}
+
+
+class Checkpoint:
+    def __init__(self, session_id, path, query, workspace_root):
+        self.session_id = session_id
+        self.path = path
+        self.query = query
+        self.workspace_root = workspace_root
+        # restored by load(): the query plus every completed step's turns; run_session continues from here
+        self.messages: list[types.Content] = []
+        # restored by load(): each completed step's tool calls and their (compacted) responses
+        self.tool_results: list[list[dict]] = []
+        self.next_step = 0
+        self.stats: dict = {}
+        self.status: str | None = None
+        self.final: str | None = None
+        self._header: dict | None = None
+
+    @classmethod
+    def create(cls, query: str, workspace_root: str) -> "Checkpoint":
+        session_id = time.strftime("%Y%m%d-%H%M%S-") + secrets.token_hex(3)
+        cp = cls(session_id, os.path.join(_dir(), session_id + ".jsonl"), query, workspace_root)
+        # written by the first _append
+        cp._header = {"session": session_id, "query": query, "workspace": workspace_root, "created": time.time()}
+        return cp
+
+    @classmethod
+    def load(cls, session_id: str) -> "Checkpoint | None":
+        path = os.path.join(_dir(), os.path.basename(session_id) + ".jsonl")
+        try:
+            with open(path, "rb") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        cp = None
+        offset = 0
+        for line in lines:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(line)
+            except ValueError:
+                # torn write from a crash: keep the intact prefix so later appends stay readable
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+                break
+            offset += len(line)
+            if cp is None:
+                cp = cls(record["session"], path, record["query"], record["workspace"])
+                # steps only store what they added; the conversation starts with the query
+                cp.messages.append(types.Content(role="user", parts=[types.Part.from_text(text=cp.query)]))
+            elif "step" in record:
+                cp.messages.extend(types.Content.model_validate(m) for m in record["messages"])
+                cp.tool_results.append(record.get("tools", []))
+                cp.stats = record["stats"]
+                cp.next_step = record["step"] + 1
+                cp.status = cp.final = None
+            elif "end" in record:
+                cp.status, cp.final = record["end"], record.get("final")
+        return cp
+
+    def _append(self, record):
+        records = [record] if self._header is None else [self._header, record]
+        if self._header is not None:
+            os.makedirs(_dir(), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(_dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._header is not None:
+            self._header = None
+            _prune()
+
+    def record_step(self, step: int, new_messages: list, tools: list[dict], stats: dict):
+        """Persist one completed iteration: the model turns it added, its tool results, running totals."""
+        tools = [{**t, "response": _compact(t.get("response"))} for t in tools]
+        self._append({
+            "step": step,
+            "messages": [m.model_dump(mode="json", exclude_none=True) for m in new_messages],
+            "tools": tools,
+            "stats": stats,
+        })
+        self.tool_results.append(tools)
+        self.next_step = step + 1
+
+    def record_end(self, status: str, final: str | None):
+        self._append({"end": status, "final": final})
+        self.status, self.final = status, final
@@ -0,0 +1,47 @@
+# client.py
+"""
+Thin CLI for daemon.py: python client.py "<query>" [--verbose] [--socket PATH] [--workspace PATH]
+"""
+import json
+import os
+import socket
+import sys
+
+import config
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("No query provided")
+        sys.exit(1)
+
+    args = sys.argv
+    query = args[1]
+    verbose = "--verbose" in args
+    socket_path = args[args.index("--socket") + 1] if "--socket" in args else config.DAEMON_SOCKET
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            print(f"Error: cannot reach daemon at {socket_path}: {e}")
+            sys.exit(1)
+        request = {"query": query, "verbose": verbose}
+        if "--workspace" in args:
+            # the daemon resolves relative paths against its own cwd
+            request["workspace"] = os.path.abspath(args[args.index("--workspace") + 1])
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        print("Error: daemon closed the connection without a reply")
+        sys.exit(1)
+    reply = json.loads(line)
+    sys.stdout.write(reply.get("output", ""))
+    if reply.get("status") == "error":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
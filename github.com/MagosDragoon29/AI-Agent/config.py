@@ -1,7 +1,49 @@
 # config.py
 
 MAX_CHAR_LIMIT = 10_000
+MODEL_NAME = "gemini-2.0-flash-001"
+# search_code response budget (serialized characters)
+SEARCH_MAX_CHARS = 8_000
+# read-ahead of the top search_code hits (see functions/prefetch.py)
+PREFETCH_TOP_N = 3
+PREFETCH_MAX_BYTES = 2_000_000
+# run_python_file scheduling and per-run limits
+RUN_MAX_PARALLEL = 4
+RUN_TIMEOUT_SECONDS = 30
+RUN_CPU_SECONDS = 30
+RUN_MAX_MEMORY_BYTES = 1024 * 1024 * 1024
+# full outputs of structured runs (see functions/get_run_log.py)
+RUN_LOG_DIR = "/tmp/ai-agent-runs"
+RUN_LOG_KEEP = 200
 default_work_dir = "./calculator"
+# main.py: model round trips per session (a resumed session gets a fresh budget)
+MAX_ITERATIONS = 20
+# per-session checkpoints for main.py --resume (see checkpoint.py)
+CHECKPOINT_DIR = "~/.cache/ai-agent/sessions"
+CHECKPOINT_KEEP = 100
+# tool responses longer than this (as JSON) are cut down in checkpoint step records
+CHECKPOINT_TOOL_RESULT_CHARS = 2000
+# name-only search_code: how long the path index trusts the snapshot before refreshing it
+PATH_INDEX_TTL_SECONDS = 1.0
+# main.py --profile: allocation sites listed per step
+PROFILE_TOP_N = 15
+# functions/snapshot.py: change batches remembered for changed_since()
+SNAPSHOT_HISTORY = 256
+# daemon.py: every Nth poll also re-stats every file (catches in-place edits by other processes)
+SNAPSHOT_VERIFY_EVERY = 5
+# per-root caches kept alive at once (see functions/workspace.py)
+MAX_WORKSPACES = 8
+
+# daemon.py / client.py
+DAEMON_SOCKET = "/tmp/ai-agent.sock"
+DAEMON_POLL_SECONDS = 2.0
+
+# router.py: minimum confidence to answer a query without the model
+ROUTER_MIN_CONFIDENCE = 0.85
+
+# main.py --batch
+BATCH_CONCURRENCY = 4
+MODEL_MAX_CALLS_PER_SECOND = 5.0
 
 
 SYSTEM_PROMPT = """
@@ -13,6 +55,7 @@ Always follow this sequence when the user asks to *find* or *edit* code:
    - Call `search_code` with a scoped `root` (default to config.default_work_dir).
    - Provide `extensions` for the language (e.g., ['.py']) and a specific `name_globs` if known.
    - If looking for a symbol or phrase, include `content_query` (plain text first; if noisy, retry with `use_regex=true`).
+   - If looking for several related symbols, pass them together in `content_queries` (one search, not one per symbol).
    - Use `context_lines=2`.
 
 2) Pick a target file:
@@ -37,6 +80,7 @@ Always follow this sequence when the user asks to *find* or *edit* code:
 
 6) Verify:
    - If appropriate, run `run_python_file` (e.g., your tests or entrypoint).
+   - When running tests, pass `structured=true` and read one failure's full traceback with `get_run_log` only if needed.
    - If failures occur, show the error output and either:
      - Adjust the patch and retry, or
      - Restore the “.bak” (write the backup back to the original path).
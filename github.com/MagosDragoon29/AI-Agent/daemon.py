@@ -0,0 +1,139 @@
+# daemon.py
+"""
+Long-lived agent server: keeps the model backend, tool layer and caches resident
+and serves queries over a Unix domain socket (see client.py).
+
+Usage: python daemon.py [--socket PATH] [--poll SECONDS] [--backend fake [--script turns.json]] [--router]
+
+Protocol: one JSON request line {"query": "...", "verbose": false, "workspace": optional root}
+per connection,
+answered with one JSON line {"status": ..., "final": ..., "output": "<captured stdout>"}.
+"""
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+import config
+import main as agent
+from backends import backend_from_args
+from router import DEFAULT_ROUTER
+import session_io
+from functions.workspace import all_workspaces, get_workspace
+
+
+class _SessionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except json.JSONDecodeError as e:
+            self._reply({"status": "error", "final": None, "output": f"Error: bad request: {e}\n"})
+            return
+        query = request.get("query")
+        if not query:
+            self._reply({"status": "error", "final": None, "output": "No query provided\n"})
+            return
+
+        with session_io.capture() as buf:
+            try:
+                workspace = get_workspace(request["workspace"]) if request.get("workspace") else None
+                outcome = agent.run_session(
+                    self.server.backend,
+                    query,
+                    verbose=bool(request.get("verbose")),
+                    limiter=self.server.limiter,
+                    workspace=workspace,
+                    router=self.server.router,
+                )
+            except Exception as e:
+                print(f"Session failed: {e}")
+                outcome = {"status": "error", "final": None}
+        self._reply({**outcome, "output": buf.getvalue()})
+
+    def _reply(self, payload):
+        self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+
+
+class AgentDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, backend, router=None):
+        self.backend = backend
+        self.router = router
+        self.limiter = agent.RateLimiter(config.MODEL_MAX_CALLS_PER_SECOND)
+        super().__init__(socket_path, _SessionHandler)
+
+
+def _check(ws, verify):
+    """
+    Refresh (or verify) ws's snapshot and drop cached state for just the files that changed
+    (everything, if the snapshot's history no longer reaches back far enough). Errors are
+    logged and drop all of ws's caches, so they cannot go stale behind a dead watcher.
+    """
+    try:
+        snapshot = ws.snapshot()
+        seen = snapshot.generation
+        if verify:
+            snapshot.verify()
+        else:
+            snapshot.refresh()
+        changed = snapshot.changed_since(seen)
+        if changed is None:
+            ws.clear()
+        elif changed:
+            ws.forget(changed)
+    except Exception as e:
+        print(f"[watch] {ws.root}: {type(e).__name__}: {e}; caches cleared", file=sys.stderr)
+        ws.clear()
+
+
+def _watch(interval, stop):
+    """Poll every live workspace (see _check) until stop is set; every Nth poll also verifies."""
+    polls = 0
+    while not stop.wait(interval):
+        polls += 1
+        for ws in all_workspaces():
+            _check(ws, polls % config.SNAPSHOT_VERIFY_EVERY == 0)
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise SystemExit(f"Error: a daemon is already listening on {path}")
+
+
+def main():
+    args = sys.argv
+    socket_path = args[args.index("--socket") + 1] if "--socket" in args else config.DAEMON_SOCKET
+    interval = float(args[args.index("--poll") + 1]) if "--poll" in args else config.DAEMON_POLL_SECONDS
+
+    _remove_stale_socket(socket_path)
+    session_io.install()
+    stop = threading.Event()
+    get_workspace(config.default_work_dir)
+    watcher = threading.Thread(target=_watch, args=(interval, stop), daemon=True)
+    watcher.start()
+
+    # --router answers deterministic queries without the model (see router.py)
+    router = DEFAULT_ROUTER if "--router" in args else None
+    with AgentDaemon(socket_path, backend_from_args(args), router) as server:
+        print(f"ai-agent daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    main()
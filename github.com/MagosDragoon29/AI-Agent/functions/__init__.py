@@ -4,6 +4,7 @@ from .write_file import write_file, schema_write_file
 from .run_python_file import run_python_file, schema_run_python_file
 from .call_function import call_function
 from .search_code import search_code, schema_search_code
+from .get_run_log import get_run_log, schema_get_run_log
 
 __all__ = [
     "get_files_info", 
@@ -16,4 +17,6 @@ __all__ = [
     "call_function",
     "search_code",
     "schema_search_code",
+    "get_run_log",
+    "schema_get_run_log",
     ]
@@ -8,8 +8,11 @@ from google.genai import types
 from .get_files_info import get_files_info
 from .get_file_content import get_file_content
 from .run_python_file import run_python_file
+from .get_run_log import get_run_log
 from .write_file import write_file
 from .search_code import search_code
+from .walker import walk
+from .workspace import Workspace, all_workspaces, get_workspace
 
 FUNCTION_MAP = {
     "get_files_info": get_files_info,
@@ -17,10 +20,16 @@ FUNCTION_MAP = {
     "run_python_file": run_python_file,
     "write_file": write_file,
     "search_code": search_code,
+    "get_run_log": get_run_log,
 }
 
-# Cache last search results to resolve basenames in follow-up calls
-_LAST_SEARCH_RESULTS: list[dict] = []
+# Tools that take a `workspace` for their caches
+_WORKSPACE_TOOLS = {"get_file_content", "search_code"}
+
+def clear_caches():
+    """Drop cached state of every workspace, e.g. after files changed on disk."""
+    for ws in all_workspaces():
+        ws.clear()
 
 def _tool_error(function_name: str, message: str) -> types.Content:
     return types.Content(
@@ -66,6 +75,11 @@ def _apply_arg_aliases(func_name: str, func_args: dict) -> dict:
             func_args["name_globs"] = _ensure_list(func_args["name_globs"])
         if "extensions" in func_args:
             func_args["extensions"] = _lower_exts(_ensure_list(func_args["extensions"]))
+        if "content_queries" in func_args:
+            queries = _ensure_list(func_args.pop("content_queries")) or []
+            if func_args.get("content_query"):
+                queries = _ensure_list(func_args["content_query"]) + queries
+            func_args["content_query"] = queries
         if "content_query" not in func_args:
             if "needle" in func_args:
                 aliases["content_query"] = func_args.pop("needle")
@@ -79,10 +93,11 @@ def _apply_arg_aliases(func_name: str, func_args: dict) -> dict:
     func_args.update(aliases)
     return func_args
 
-def _resolve_path_if_needed(wd: str, path: str | None, verbose: bool) -> str | None:
+def _resolve_path_if_needed(ws: Workspace, path: str | None, verbose: bool) -> str | None:
     """If the model passed a basename, try to resolve to a unique path within WD."""
     if not path:
         return path
+    wd = ws.root
 
     # Already valid?
     if os.path.exists(os.path.join(wd, path)):
@@ -92,7 +107,7 @@ def _resolve_path_if_needed(wd: str, path: str | None, verbose: bool) -> str | N
 
     # 1) Try last search results (exact basename matches only)
     candidates = []
-    for r in _LAST_SEARCH_RESULTS:
+    for r in ws.last_search_results:
         rp = r.get("path")
         if isinstance(rp, str) and os.path.basename(rp) == base:
             if os.path.exists(os.path.join(wd, rp)):
@@ -104,7 +119,7 @@ def _resolve_path_if_needed(wd: str, path: str | None, verbose: bool) -> str | N
 
     # 2) Scan WD for a unique basename match
     found = []
-    for dirpath, _, files in os.walk(wd):
+    for dirpath, _, files in walk(wd):
         for f in files:
             if f == base:
                 rel = os.path.relpath(os.path.join(dirpath, f), wd)
@@ -117,7 +132,12 @@ def _resolve_path_if_needed(wd: str, path: str | None, verbose: bool) -> str | N
     # Give up; let the tool error out naturally
     return path
 
-def call_function(function_call_part, verbose: bool = False):
+def call_function(function_call_part, verbose: bool = False, workspace: Workspace | None = None):
+    """
+    Dispatch one model function call. workspace carries the root and caches to use;
+    without one, the shared workspace for config.default_work_dir is used.
+    """
+    ws = workspace or get_workspace(config.default_work_dir)
     raw_name = getattr(function_call_part, "name", "") or ""
     func_name = raw_name.removeprefix("schema_")
 
@@ -141,7 +161,9 @@ def call_function(function_call_part, verbose: bool = False):
     func_args = _apply_arg_aliases(func_name, func_args)
 
     # Inject working directory
-    func_args["working_directory"] = config.default_work_dir  # e.g., "./calculator"
+    func_args["working_directory"] = ws.root
+    if func_name in _WORKSPACE_TOOLS:
+        func_args["workspace"] = ws
 
     # Default verbose for search_code to CLI flag if not set
     if func_name == "search_code" and "verbose" not in func_args:
@@ -150,17 +172,21 @@ def call_function(function_call_part, verbose: bool = False):
     # Smart path resolution for file ops
     if func_name in ("get_file_content", "write_file"):
         key = "file_path"
-        func_args[key] = _resolve_path_if_needed(func_args["working_directory"], func_args.get(key), verbose)
+        func_args[key] = _resolve_path_if_needed(ws, func_args.get(key), verbose)
 
     if verbose:
         print(f" - Calling function: {func_name} ({func_args})")
 
     try:
         result = FUNCTION_MAP[func_name](**func_args)
+        if func_name == "write_file":
+            # record the write in the snapshot and let name searches see new files right away
+            ws.note_write(os.path.join(ws.root, func_args["file_path"]))
         # keep search results for path resolution
         if func_name == "search_code" and isinstance(result, list):
-            global _LAST_SEARCH_RESULTS
-            _LAST_SEARCH_RESULTS = [r for r in result if isinstance(r, dict) and "path" in r]
+            ws.last_search_results = [r for r in result if isinstance(r, dict) and "path" in r]
+            # the next call is usually get_file_content on a top hit; read those ahead
+            ws.prefetch.schedule([os.path.join(ws.root, r["path"]) for r in ws.last_search_results[:config.PREFETCH_TOP_N]])
     except TypeError as e:
         if verbose:
             print(f"Error calling {func_name}: {e}")
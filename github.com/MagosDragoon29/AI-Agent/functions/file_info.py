@@ -0,0 +1,87 @@
+# functions/file_info.py
+import codecs
+import io
+import os
+
+SNIFF_BYTES = 4096
+
+
+def _sniff(path: str) -> tuple[bool, str | None]:
+    """(is_binary, encoding) from the first SNIFF_BYTES of a file."""
+    with open(path, "rb") as f:
+        chunk = f.read(SNIFF_BYTES)
+    if chunk.startswith(codecs.BOM_UTF8):
+        return False, "utf-8-sig"
+    if chunk.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False, "utf-16"
+    # Heuristic: if there are null bytes, likely binary
+    if b"\x00" in chunk:
+        return True, None
+    try:
+        # final=False: the sniff window may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(chunk, final=False)
+        return False, "utf-8"
+    except UnicodeDecodeError:
+        return False, "latin-1"
+
+
+class FileClassifier:
+    """
+    Per-file {"binary", "encoding", "errors", "size", "lines"} cached by (inode, size, mtime_ns),
+    so repeated tool calls skip the sniffing I/O and decode with the right codec.
+    """
+
+    def __init__(self):
+        self._cache: dict[str, tuple[tuple[int, int, int], dict]] = {}
+
+    def classify(self, path: str) -> dict | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        cached = self._cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        try:
+            binary, encoding = _sniff(path)
+        except OSError:
+            binary, encoding = True, None  # be conservative
+        info = {"binary": binary, "encoding": encoding, "errors": "strict", "size": st.st_size, "lines": None}
+        self._cache[path] = (key, info)
+        return info
+
+    def read_text(self, path: str, max_bytes: int | None = None) -> str | None:
+        """Decoded contents, or None for binaries, files over max_bytes and unreadable files."""
+        info = self.classify(path)
+        if info is None or info["binary"]:
+            return None
+        if max_bytes is not None and info["size"] > max_bytes:
+            return None
+        try:
+            with open(path, "r", encoding=info["encoding"], errors=info["errors"]) as f:
+                text = f.read()
+        except UnicodeDecodeError:
+            # the sniff window decoded but a later byte does not: keep the codec so the
+            # valid multibyte text survives, replace the bad bytes, and remember for next time
+            info["errors"] = "replace"
+            try:
+                with open(path, "r", encoding=info["encoding"], errors="replace") as f:
+                    text = f.read()
+            except OSError:
+                return None
+        except OSError:
+            return None
+        info["lines"] = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+        return text
+
+    def read_lines(self, path: str, max_bytes: int | None = None) -> list[str] | None:
+        text = self.read_text(path, max_bytes)
+        return None if text is None else io.StringIO(text).readlines()
+
+    def discard(self, path: str):
+        self._cache.pop(path, None)
+
+    def clear(self):
+        self._cache.clear()
+
@@ -2,8 +2,9 @@ import os
 import config
 from google import genai
 from google.genai import types
+from .workspace import Workspace, get_workspace
 
-def get_file_content(working_directory, file_path):
+def get_file_content(working_directory, file_path, workspace: Workspace | None = None):
     if file_path == None:
         print("Result for current file:")
     else:
@@ -23,11 +24,19 @@ def get_file_content(working_directory, file_path):
     if not os.path.isfile(full) or not os.path.exists(full):
         return f'Error: File not found or is not a regular file: "{file_path}"'
     
-    try:
-        with open(full, "r") as f:
-            contents = f.read()
-    except Exception as e:
-        return f'Error: {e}'
+    # served from memory if a recent search_code already warmed it
+    ws = workspace or get_workspace(wd)
+    contents = ws.prefetch.get(full)
+    if contents is None:
+        info = ws.files.classify(full)
+        if info is None:
+            return f'Error: File not found or is not a regular file: "{file_path}"'
+        if info["binary"]:
+            return f'Error: "{file_path}" looks like a binary file'
+
+        contents = ws.files.read_text(full)
+        if contents is None:
+            return f'Error: Could not read "{file_path}"'
     
     if len(contents) > config.MAX_CHAR_LIMIT:
         contents = contents[:config.MAX_CHAR_LIMIT]
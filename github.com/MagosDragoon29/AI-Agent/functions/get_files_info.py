@@ -1,6 +1,7 @@
 import os
 from google import genai
 from google.genai import types
+from .walker import is_ignored, matchers_for
 
 def get_files_info(working_directory, directory="."):
     wd = os.path.abspath(working_directory)
@@ -23,12 +24,15 @@ def get_files_info(working_directory, directory="."):
         print(f'Error: "{directory}" is not a directory')
         return None
 
-    # processing
+    # processing (entries excluded by DEFAULT_IGNORES or .gitignore/.ignore are hidden)
+    chain = matchers_for(wd, full)
     files = os.listdir(full) 
     for file in files:
         file_dir = os.path.join(full, file)
-        size = os.path.getsize(file_dir)
         dir_query = os.path.isdir(file_dir)
+        if is_ignored(chain, full, file, dir_query):
+            continue
+        size = os.path.getsize(file_dir)
         print(f'- {file}: file_size={size} bytes, is_dir={dir_query}')
     pass
 
@@ -0,0 +1,78 @@
+# functions/get_run_log.py
+import os
+import re
+import secrets
+import time
+from google.genai import types
+import config
+from .test_report import failure_block
+
+_RUN_ID_RE = re.compile(r"^[\w-]+$")
+
+
+def save_run_log(text: str) -> str | None:
+    """Store a full run_python_file output under config.RUN_LOG_DIR; returns its run id."""
+    run_id = time.strftime("%Y%m%d-%H%M%S-") + secrets.token_hex(3)
+    try:
+        os.makedirs(config.RUN_LOG_DIR, exist_ok=True)
+        with open(os.path.join(config.RUN_LOG_DIR, run_id + ".log"), "w", encoding="utf-8") as f:
+            f.write(text)
+        _prune()
+    except OSError:
+        return None
+    return run_id
+
+
+def _prune():
+    # ids sort by creation time; keep the newest config.RUN_LOG_KEEP
+    logs = sorted(n for n in os.listdir(config.RUN_LOG_DIR) if n.endswith(".log"))
+    for name in logs[:-config.RUN_LOG_KEEP]:
+        try:
+            os.remove(os.path.join(config.RUN_LOG_DIR, name))
+        except OSError:
+            pass
+
+
+def get_run_log(working_directory, run_id, test_id=None):
+    if not run_id or not _RUN_ID_RE.match(run_id):
+        return f'Error: Invalid run id "{run_id}"'
+    path = os.path.join(config.RUN_LOG_DIR, run_id + ".log")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return f'Error: No log for run "{run_id}" (logs are kept for the last {config.RUN_LOG_KEEP} runs)'
+
+    if test_id:
+        block = failure_block(text, test_id)
+        if block is None:
+            return f'Error: No failure for "{test_id}" in run "{run_id}"'
+        text = block
+
+    if len(text) > config.MAX_CHAR_LIMIT:
+        text = text[:config.MAX_CHAR_LIMIT] + f'...Log "{run_id}" truncated at {config.MAX_CHAR_LIMIT:,} characters'
+    return text
+
+
+schema_get_run_log = types.FunctionDeclaration(
+    name="get_run_log",
+    description="Returns the full output of an earlier run_python_file call made with structured=true, or just one failing test's traceback.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "working_directory": types.Schema(
+                type=types.Type.STRING,
+                description="Use '.' for the project root."
+            ),
+            "run_id": types.Schema(
+                type=types.Type.STRING,
+                description="The run_id from a structured run_python_file result."
+            ),
+            "test_id": types.Schema(
+                type=types.Type.STRING,
+                description="Optional failing test id from that result; returns only its traceback."
+            ),
+        },
+        required=["working_directory", "run_id"],
+    ),
+)
@@ -0,0 +1,134 @@
+# functions/path_index.py
+import fnmatch
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import config
+from .snapshot import WorkspaceSnapshot
+from .walker import DEFAULT_IGNORES
+
+
+@lru_cache(maxsize=256)
+def compile_globs(globs: tuple[str, ...]):
+    """
+    (filter, scorers) for a set of filename globs: filter is one regex matching if any glob
+    matches (case-sensitive, like fnmatch on POSIX); scorers are case-insensitive per-glob regexes.
+    """
+    if not globs:
+        return None, []
+    combined = re.compile("|".join(f"(?:{fnmatch.translate(g)})" for g in globs))
+    scorers = [re.compile(fnmatch.translate(g.lower())) for g in globs]
+    return combined, scorers
+
+
+def _ext(name):
+    return os.path.splitext(name)[1].lower()
+
+
+class PathIndex:
+    """
+    Every non-ignored file under a workspace root, bucketed by extension, for name-only
+    search_code queries. The files come from the workspace's WorkspaceSnapshot, minus anything
+    under an extra_ignores directory: at most every config.PATH_INDEX_TTL_SECONDS the snapshot
+    is refreshed and the buckets take just the paths changed_since() the last sync. An edited
+    .gitignore is only picked up once its directory changes or the workspace is cleared.
+    """
+
+    def __init__(self, snapshot: WorkspaceSnapshot, extra_ignores=None):
+        self.snapshot = snapshot
+        self.root = snapshot.root
+        self.extra = set(extra_ignores or ()) - DEFAULT_IGNORES
+        self._by_ext: dict[str, set[str]] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        # snapshot generation the buckets reflect; keys the query cache
+        self.generation = -1
+        self._queries: dict[tuple, list[tuple[str, float]]] = {}
+        with self._lock:
+            self._sync()
+
+    def __len__(self):
+        return sum(len(b) for b in self._by_ext.values())
+
+    def _excluded(self, rel):
+        return bool(self.extra) and not self.extra.isdisjoint(rel.split(os.sep)[:-1])
+
+    def _sync(self):
+        """Catch the buckets up with the snapshot (caller holds the lock)."""
+        if time.monotonic() - self._checked >= config.PATH_INDEX_TTL_SECONDS:
+            self.snapshot.refresh()
+            self._checked = time.monotonic()
+        # read before changed_since: anything newer is picked up (again) on the next sync
+        generation = self.snapshot.generation
+        if generation == self.generation:
+            return
+        changed = self.snapshot.changed_since(self.generation) if self.generation >= 0 else None
+        if changed is None:
+            self._by_ext = {}
+            present = self.snapshot.files()
+        else:
+            for rel in changed:
+                self._by_ext.get(_ext(rel), set()).discard(rel)
+            present = self.snapshot.files(changed)
+        for rel in present:
+            if not self._excluded(rel):
+                self._by_ext.setdefault(_ext(rel), set()).add(rel)
+        self.generation = generation
+        self._queries.clear()
+
+    def covers(self, dirpath: str) -> bool:
+        """Whether dirpath is indexed (it is not if it, or a parent, is ignored)."""
+        with self._lock:
+            self._sync()
+        full = os.path.abspath(dirpath)
+        rel = os.path.relpath(full, self.root)
+        return self.snapshot.has_dir(full) and not self._excluded(os.path.join(rel, ""))
+
+    def invalidate(self):
+        """Refresh the snapshot on the next query regardless of the TTL (e.g. after write_file)."""
+        self._checked = 0.0
+
+    def find(self, base_rel: str, name_globs, extensions) -> list[tuple[str, float]]:
+        """
+        [(path relative to root, filename score)] for files under base_rel matching the
+        extensions and globs; same scoring as search_code's walk (+1 per matching glob,
+        +0.5 for a requested extension).
+        """
+        key = (base_rel, tuple(name_globs or ()), tuple(extensions or ()))
+        with self._lock:
+            self._sync()
+            cached = self._queries.get(key)
+            if cached is not None:
+                return cached
+            if extensions:
+                candidates = [p for e in dict.fromkeys(extensions) for p in self._by_ext.get(e, ())]
+            else:
+                candidates = [p for bucket in self._by_ext.values() for p in bucket]
+            prefix = "" if base_rel in (".", "") else base_rel.rstrip(os.sep) + os.sep
+            flt, scorers = compile_globs(tuple(name_globs or ()))
+            bonus = 0.5 if extensions else 0.0
+            scores = {}  # basename -> score or None; big trees repeat names a lot
+            found = []
+            for path in candidates:
+                if prefix and not path.startswith(prefix):
+                    continue
+                name = path.rpartition(os.sep)[2]
+                if name not in scores:
+                    if flt is None:
+                        scores[name] = bonus
+                    elif flt.match(name):
+                        lower = name.lower()
+                        scores[name] = bonus + sum(1.0 for rx in scorers if rx.match(lower))
+                    else:
+                        scores[name] = None
+                score = scores[name]
+                if score is not None:
+                    found.append((path, score))
+            found.sort(key=lambda t: (-t[1], t[0]))
+            if len(self._queries) >= 64:
+                self._queries.clear()
+            self._queries[key] = found
+            return found
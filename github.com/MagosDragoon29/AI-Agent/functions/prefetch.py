@@ -0,0 +1,99 @@
+# functions/prefetch.py
+import os
+import threading
+from collections import OrderedDict
+
+from .file_info import FileClassifier
+
+
+class Prefetcher:
+    """
+    Background read-ahead for files the model is likely to open next (the top search_code hits).
+    Entries are validated against (inode, size, mtime_ns) on lookup and evicted LRU-first
+    to stay within max_bytes, counted as each file's size on disk (not decoded characters).
+    """
+
+    def __init__(self, max_bytes: int, files: FileClassifier):
+        self.max_bytes = max_bytes
+        self.files = files
+        self._entries: OrderedDict[str, tuple[tuple[int, int, int], str]] = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def schedule(self, paths: list[str]):
+        if not paths or self.max_bytes <= 0:
+            return
+        threading.Thread(target=self._warm, args=(list(paths),), daemon=True).start()
+
+    def _warm(self, paths):
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if st.st_size > self.max_bytes:
+                continue
+            with self._lock:
+                cached = self._entries.get(path)
+                if cached and cached[0] == key:
+                    continue
+            text = self.files.read_text(path, self.max_bytes)
+            if text is None:
+                continue
+            with self._lock:
+                self._store(path, key, text)
+                self.prefetched += 1
+
+    def _store(self, path, key, text):
+        # key[1] is st_size
+        old = self._entries.pop(path, None)
+        if old:
+            self._used -= old[0][1]
+        while self._entries and self._used + key[1] > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._used -= evicted[1]
+        self._entries[path] = (key, text)
+        self._used += key[1]
+
+    def get(self, path: str) -> str | None:
+        """Cached contents if still current; counts a hit or a miss."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached and cached[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "prefetched": self.prefetched,
+                "resident_bytes": self._used,
+            }
+
+    def discard(self, path: str):
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self._used -= old[0][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used = 0
+
@@ -1,10 +1,136 @@
 # functions/run_python.py
 import os
 import sys
+import time
+import signal
+import threading
 import subprocess
 from google.genai import types
+import config
+from .get_run_log import save_run_log
+from .test_report import parse_test_output
 
-def run_python_file(working_directory, file_path, args=[]):
+# Process-wide cap on concurrent child interpreters; extra runs queue here.
+_RUN_SLOTS = threading.BoundedSemaphore(config.RUN_MAX_PARALLEL)
+
+
+# Sets the limits, then execs the real command (argv[3:]) in the same process. Unlike
+# preexec_fn, no Python runs between fork and exec, which is unsafe while other threads
+# (daemon and batch workers) hold locks. -S skips site so the extra start-up stays small.
+_LIMIT_WRAPPER = """\
+import os, resource, sys
+cpu, mem = int(sys.argv[1]), int(sys.argv[2])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+os.execv(sys.argv[3], sys.argv[3:])
+"""
+
+
+def _limited(cmd):
+    """cmd wrapped so it runs under config.RUN_CPU_SECONDS and config.RUN_MAX_MEMORY_BYTES."""
+    return [sys.executable, "-S", "-c", _LIMIT_WRAPPER,
+            str(config.RUN_CPU_SECONDS), str(config.RUN_MAX_MEMORY_BYTES), *cmd]
+
+
+def _vm_hwm_kib(pid):
+    """Peak RSS of a live process since its exec (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _drain(stream, sink):
+    sink.append(stream.read())
+    stream.close()
+
+
+def _run_limited(cmd, cwd, timeout):
+    """
+    Run cmd in its own process group with CPU/address-space limits.
+    Returns (exit_code, stdout, stderr, timed_out, cpu_seconds, peak_rss_kib).
+    """
+    p = subprocess.Popen(
+        _limited(cmd),
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,  # own process group, so a timeout kills grandchildren too
+    )
+
+    out, err = [], []
+    readers = [
+        threading.Thread(target=_drain, args=(p.stdout, out), daemon=True),
+        threading.Thread(target=_drain, args=(p.stderr, err), daemon=True),
+    ]
+    for t in readers:
+        t.start()
+
+    # wait4 instead of Popen.wait so the child's rusage (CPU time) is kept. Its ru_maxrss is
+    # not usable: Linux carries the parent's high-water mark across fork+exec, so peak RSS
+    # is sampled from /proc while the child runs instead.
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    timed_out = False
+    peak_kib = None
+    while True:
+        pid, status, rusage = os.wait4(p.pid, os.WNOHANG)
+        if pid:
+            break
+        hwm = _vm_hwm_kib(p.pid)
+        if hwm is not None:
+            peak_kib = max(peak_kib or 0, hwm)
+        if time.monotonic() >= deadline:
+            timed_out = True
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            pid, status, rusage = os.wait4(p.pid, 0)
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    p.returncode = os.waitstatus_to_exitcode(status)
+
+    for t in readers:
+        t.join(timeout=1)
+    stdout = b"".join(out).decode("utf-8", errors="replace")
+    stderr = b"".join(err).decode("utf-8", errors="replace")
+    if peak_kib is None:
+        peak_kib = rusage.ru_maxrss  # no /proc; an upper bound
+    return p.returncode, stdout, stderr, timed_out, rusage.ru_utime + rusage.ru_stime, peak_kib
+
+
+def _structured(wd, out, code, timed_out, cpu, peak_kib, queue_wait):
+    """Compact summary of a run; the full output goes to disk under its run_id (see get_run_log)."""
+    summary = {
+        "run_id": save_run_log(out),
+        "exit_code": code,
+        "cpu_s": round(cpu, 2),
+        "peak_rss_mb": round(peak_kib / 1024, 1),
+        "queue_wait_s": round(queue_wait, 2),
+    }
+    if timed_out:
+        summary["timed_out"] = True
+    report = parse_test_output(out)
+    if report:
+        for failure in report["failures"]:
+            if failure["frame"] and failure["frame"].startswith(wd + os.sep):
+                failure["frame"] = os.path.relpath(failure["frame"], wd)
+        summary.update(report)
+    else:
+        # not test output: the tail is usually what matters
+        lines = out.rstrip().splitlines()
+        summary["tail"] = "\n".join(lines[-15:])
+        summary["lines"] = len(lines)
+    return summary
+
+
+def run_python_file(working_directory, file_path, args=[], structured=False):
     try:
         wd = os.path.abspath(working_directory)
         full = os.path.abspath(os.path.join(wd, file_path))
@@ -23,22 +149,29 @@ def run_python_file(working_directory, file_path, args=[]):
             else:
                 cmd.extend(str(a) for a in args)
 
-        cp = subprocess.run(
-            cmd,
-            cwd=wd,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        queued = time.monotonic()
+        with _RUN_SLOTS:
+            queue_wait = time.monotonic() - queued
+            code, stdout, stderr, timed_out, cpu, peak_kib = _run_limited(cmd, wd, config.RUN_TIMEOUT_SECONDS)
 
         # Return raw stdout first so "Ran 9 tests" is visible to the grader,
         # then append stderr if present. No labels.
-        out = (cp.stdout or "")
-        if cp.stderr:
-            out += (cp.stderr if out.endswith("\n") else "\n") + cp.stderr
+        out = (stdout or "")
+        if stderr:
+            if out and not out.endswith("\n"):
+                out += "\n"
+            out += stderr
+        if timed_out:
+            out = f"Error: executing Python file: timed out after {config.RUN_TIMEOUT_SECONDS}s\n" + out
         if not out.strip():
             out = "No output produced."
-        return out
+        if structured:
+            return _structured(wd, out, code, timed_out, cpu, peak_kib, queue_wait)
+        stats = (
+            f"[run] exit={code} cpu={cpu:.2f}s "
+            f"peak_rss={peak_kib / 1024:.1f}MB queue_wait={queue_wait:.2f}s"
+        )
+        return out + ("" if out.endswith("\n") else "\n") + stats
 
     except Exception as e:
         return f"Error: executing Python file: {e}"
@@ -63,6 +196,10 @@ schema_run_python_file = types.FunctionDeclaration(
                 items=types.Schema(type=types.Type.STRING),
                 description="Optional list of arguments to pass to the Python script."
             ),
+            "structured": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Return a compact summary (test counts, failing test ids, first relevant frame and message) instead of the raw output. The full output is kept; fetch it with get_run_log."
+            ),
         },
         required=["working_directory", "file_path"],
     ),
@@ -1,57 +1,99 @@
 # functions/search_code.py
 import os
 import re
-import fnmatch
+import json
+from collections import Counter
 # functions/schema_search_code.py
 from google.genai import types
+import config
+from . import search_index
+from .path_index import compile_globs
+from .walker import walk
+from .workspace import Workspace, get_workspace
 
-DEFAULT_IGNORES = {
-    ".git", ".venv", "__pycache__", "node_modules", ".mypy_cache", ".pytest_cache", ".idea", ".vscode", "dist", "build"
-}
-TEXT_EXT_HINT = {
-    ".py", ".go", ".c", ".h", ".cpp", ".hpp", ".rs", ".java", ".js", ".ts", ".tsx", ".jsx",
-    ".json", ".toml", ".yaml", ".yml", ".md", ".txt", ".ini", ".cfg", ".sh", ".ps1", ".bat",
-}
-
-def _is_binary_guess(path, max_bytes=4096):
-    try:
-        with open(path, "rb") as f:
-            chunk = f.read(max_bytes)
-        if not chunk:
-            return False
-        # Heuristic: if there are null bytes, likely binary
-        return b"\x00" in chunk
-    except Exception:
-        return True  # be conservative
-
-def _read_lines_safe(path, max_bytes=2_000_000):
-    size = os.path.getsize(path)
-    if size > max_bytes:
-        return None  # too big to scan
-    try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            return f.readlines()
-    except Exception:
-        return None
-
-def _match_any_glob(name, patterns):
-    return any(fnmatch.fnmatch(name, p) for p in patterns)
+MAX_SCAN_BYTES = 2_000_000  # larger files are too big to scan
 
 def _ext(name):
     return os.path.splitext(name)[1].lower()
 
+def _merge_windows(line_nos, context_lines, lines):
+    """One snippet per region: overlapping or adjacent match windows are merged."""
+    snippets = []
+    for n in line_nos:
+        start = max(1, n - context_lines)
+        end = min(len(lines), n + context_lines)
+        if snippets and start <= snippets[-1]["end"] + 1:
+            snippets[-1]["end"] = max(end, snippets[-1]["end"])
+        else:
+            snippets.append({"start": start, "end": end})
+    for s in snippets:
+        s["lines"] = [l.rstrip("\n") for l in lines[s["start"]-1:s["end"]]]
+    return snippets
+
+def _apply_budget(results, max_chars):
+    """
+    Keep the serialized results under max_chars, trimming the lowest-scoring file first:
+    its snippets go, then the file itself, before the next file up is touched. The top
+    file only ever loses its snippets and trailing matches.
+    Appends a {"truncated": ...} entry describing what was removed, if anything was;
+    the budget covers that entry too.
+    """
+    # json.dumps of the list: "[" + items joined by ", " + "]"
+    sizes = [len(json.dumps(r)) for r in results]
+    total = sum(sizes) + 2 * len(sizes)
+    if total <= max_chars:
+        return results
+
+    snippets_dropped, files_dropped = [], []
+    counts = {"matches_dropped": 0}
+
+    def _marker():
+        return {"truncated": {
+            "max_chars": max_chars,
+            "snippets_dropped": [p for p in snippets_dropped if p not in files_dropped],
+            "files_dropped": files_dropped,
+            "matches_dropped": counts["matches_dropped"],
+        }}
+
+    def _over():
+        return total + len(json.dumps(_marker())) + 2 > max_chars
+
+    while _over() and results:
+        last = results[-1]
+        if last["snippets"]:
+            last["snippets"] = []
+            new_size = len(json.dumps(last))
+            total -= sizes[-1] - new_size
+            sizes[-1] = new_size
+            snippets_dropped.append(last["path"])
+        elif len(results) > 1:
+            total -= sizes.pop() + 2
+            files_dropped.append(results.pop()["path"])
+        else:
+            break
+    if results:
+        top_matches = results[0]["matches"]
+        while _over() and len(top_matches) > 1:
+            total -= len(json.dumps(top_matches.pop())) + 2
+            counts["matches_dropped"] += 1
+
+    results.append(_marker())
+    return results
+
 def search_code(
     working_directory: str,
     root: str = ".",
     name_globs: list[str] | None = None,      # e.g. ["*.py", "*test*"]
     extensions: list[str] | None = None,      # e.g. [".py", ".go"]
-    content_query: str | None = None,         # plain text OR regex (see use_regex)
+    content_query: str | list[str] | None = None,  # plain text OR regex (see use_regex); a list is matched in one pass
     use_regex: bool = False,
     case_sensitive: bool = False,
     max_results: int = 50,
     context_lines: int = 2,
     extra_ignores: list[str] | None = None,   # folder basenames to ignore
-    verbose: bool=False
+    max_chars: int | None = None,             # payload budget; defaults to config.SEARCH_MAX_CHARS
+    verbose: bool=False,
+    workspace: Workspace | None = None,       # caches to use; defaults to the shared one for working_directory
 ):
     """
     Returns list of dicts:
@@ -59,10 +101,22 @@ def search_code(
         "path": "relative/path/to/file.py",
         "score": float,
         "matches": [
-           {"line_no": 42, "line": "print('hi')", "preview": ["context above", "...", "context below"]}
+           {"line_no": 42, "line": "print('hi')"}
+        ],
+        "snippets": [
+           {"start": 40, "end": 44, "lines": ["context above", "...", "context below"]}
         ]
       }
-    If no content_query, 'matches' will be empty and files are ranked by filename match strength.
+    Match windows (context_lines around each hit) that overlap or touch are merged into one snippet.
+    If no content_query, 'matches' and 'snippets' will be empty and files are ranked by filename match strength;
+    those queries are answered from the workspace's path index (see path_index) without walking the tree.
+    If the results serialize to more than max_chars, snippets of the lowest-scoring files are
+    dropped first, then whole files, and a final {"truncated": {...}} entry lists what was removed.
+    If content_query is a list, the tree is walked once for all patterns (plain-text queries are
+    combined into one alternation regex, regexes are tried one by one); each match then also
+    carries "patterns": the queries that hit that line.
+    Content results are ranked by BM25 (see search_index), plus a boost for def/class lines
+    that match and a small bonus for files close to root.
     """
     # --- Safety: resolve paths inside working dir
     wd = os.path.abspath(working_directory)
@@ -80,96 +134,143 @@ def search_code(
         return None
 
     # --- Build config
-    ignored = set(DEFAULT_IGNORES)
-    if extra_ignores:
-        ignored.update(extra_ignores)
-
+    ws = workspace or get_workspace(wd)
     name_globs = name_globs or []
     extensions = [e.lower() for e in (extensions or [])]
-    do_content = content_query is not None and content_query != ""
+    if isinstance(content_query, str):
+        queries = [content_query] if content_query else []
+    else:
+        queries = [q for q in (content_query or []) if q]
+    do_content = bool(queries)
+    multi = len(queries) > 1
 
     if do_content:
         flags = 0 if case_sensitive else re.IGNORECASE
-        pattern = re.compile(content_query, flags) if use_regex else None
-        needle = content_query if case_sensitive else (content_query or "").lower()
+        sources = queries if use_regex else [re.escape(q) for q in queries]
+        query_patterns = [(q, re.compile(src, flags)) for q, src in zip(queries, sources)]
+        # `pattern` decides whether a line hits at all; the per-query regexes then only run on
+        # hit lines to tag which queries matched. Escaped literals join safely into one
+        # alternation, but user regexes may carry inline flags, backreferences or group names
+        # that break when concatenated, so those are tried one by one (pattern is None).
+        if not multi:
+            pattern = query_patterns[0][1]
+        elif not use_regex:
+            pattern = re.compile("|".join(sources), flags)
+        else:
+            pattern = None
 
+    glob_filter, glob_scorers = compile_globs(tuple(name_globs))
     results = []
+    # per content result: (query hit counts, queries with a definition hit, doc length, proximity)
+    content_stats = []
+    n_docs = 0
+    total_len = 0
 
-    for dirpath, dirnames, filenames in os.walk(base):
-        # prune ignored folders in-place
-        dirnames[:] = [d for d in dirnames if d not in ignored]
+    # name-only queries come from the path index: no walk, no per-file fnmatch
+    tree = walk(base, root=wd, extra_ignores=extra_ignores)
+    if not do_content and ws.root == wd:
+        index = ws.path_index(extra_ignores)
+        if index.covers(base):
+            tree = ()
+            if name_globs or extensions:
+                found = index.find(os.path.relpath(base, wd), name_globs, extensions)
+                results = [{"path": p, "score": s, "matches": [], "snippets": []} for p, s in found[:max_results]]
 
+    # prunes DEFAULT_IGNORES, extra_ignores and .gitignore/.ignore matches before descending
+    for dirpath, dirnames, filenames in tree:
         for fname in filenames:
             rel = os.path.relpath(os.path.join(dirpath, fname), wd)
             # filter by extension if provided
             if extensions and _ext(fname) not in extensions:
                 continue
-            # filter by name globs if provided
-            if name_globs and not _match_any_glob(fname, name_globs):
-                # allow content search to still find it if no name match specified? Keep strict:
+            # filter by name globs if provided (one combined regex; keep strict)
+            if glob_filter and not glob_filter.match(fname):
                 continue
 
             file_score = 0.0
             # simple filename scoring
-            base_lower = fname.lower()
-            for g in name_globs:
-                if fnmatch.fnmatch(base_lower, g.lower()):
-                    file_score += 1.0
-            if extensions and _ext(fname) in extensions:
+            if glob_scorers:
+                base_lower = fname.lower()
+                file_score += sum(1.0 for rx in glob_scorers if rx.match(base_lower))
+            if extensions:
                 file_score += 0.5
 
             matches = []
+            snippets = []
             if do_content:
-                # skip likely binaries if not a known text ext
-                if (_ext(fname) not in TEXT_EXT_HINT) and _is_binary_guess(os.path.join(dirpath, fname)):
-                    continue
-                lines = _read_lines_safe(os.path.join(dirpath, fname))
+                # binary/encoding/size come from the shared classification cache
+                lines = ws.files.read_lines(os.path.join(dirpath, fname), MAX_SCAN_BYTES)
                 if lines is None:
                     continue
+                doc_len = search_index.doc_length(os.path.join(dirpath, fname), lines, ws.doc_lengths)
+                n_docs += 1
+                total_len += doc_len
+                hits = Counter()
+                defs = {}
 
                 for idx, line in enumerate(lines, start=1):
-                    hit = False
-                    if use_regex:
-                        if pattern.search(line):
-                            hit = True
+                    if pattern is None:
+                        hit_queries = [q for q, rx in query_patterns if rx.search(line)]
+                    elif pattern.search(line):
+                        hit_queries = [q for q, rx in query_patterns if rx.search(line)] if multi else queries
                     else:
-                        src = line if case_sensitive else line.lower()
-                        if needle in src:
-                            hit = True
-                    if hit:
-                        start = max(1, idx - context_lines)
-                        end = min(len(lines), idx + context_lines)
-                        preview = [l.rstrip("\n") for l in lines[start-1:end]]
-                        matches.append({
+                        continue
+                    if hit_queries:
+                        match = {
                             "line_no": idx,
                             "line": line.rstrip("\n"),
-                            "preview": preview
-                        })
+                        }
+                        hits.update(hit_queries)
+                        for q, rx in query_patterns:
+                            if q in hit_queries:
+                                defs[q] = max(defs.get(q, 0.0), search_index.definition_weight(line, rx))
+                        if multi:
+                            match["patterns"] = hit_queries
+                        matches.append(match)
 
                 if matches:
-                    # content hits give a bigger bump
-                    file_score += 2.0 + min(1.0, len(matches) * 0.1)
+                    snippets = _merge_windows([m["line_no"] for m in matches], context_lines, lines)
+                    content_stats.append((hits, defs, doc_len, search_index.proximity(os.path.relpath(os.path.join(dirpath, fname), base))))
 
             if (name_globs or extensions or do_content) and (matches or not do_content):
                 results.append({
                     "path": rel,
                     "score": file_score,
-                    "matches": matches
+                    "matches": matches,
+                    "snippets": snippets
                 })
 
+    # BM25 over the files scanned in this walk: each matched line counts as one
+    # occurrence of the query that hit it; doc lengths come from the shared cache
+    if do_content and n_docs:
+        avgdl = total_len / n_docs
+        df = Counter()
+        for hits, _, _, _ in content_stats:
+            df.update(hits.keys())
+        for r, (hits, defs, doc_len, prox) in zip(results, content_stats):
+            content_score = sum(search_index.bm25(tf, df[q], n_docs, doc_len, avgdl) for q, tf in hits.items())
+            content_score += search_index.DEFINITION_BOOST * sum(defs.values())
+            r["score"] = round(r["score"] + content_score + prox, 3)
+
     # rank + trim
     results.sort(key=lambda r: r["score"], reverse=True)
-    trimmed = results[:max_results]
+    trimmed = _apply_budget(results[:max_results], config.SEARCH_MAX_CHARS if max_chars is None else max_chars)
 
     # Human-readable stdout for Boot.dev checks
     if verbose:
         print("Search Results:")
         for r in trimmed:
+            if "truncated" in r:
+                t = r["truncated"]
+                print(f'(over {t["max_chars"]} chars: snippets dropped for {len(t["snippets_dropped"])} files, '
+                      f'{len(t["files_dropped"])} files dropped)')
+                continue
             print(f'- {r["path"]} (score={r["score"]:.2f})')
-            for m in r["matches"][:3]:  # cap previews per file for readability
-                pv = " ⏤ ".join(m["preview"])
+            for m in r["matches"][:3]:  # cap matches per file for readability
                 print(f'  L{m["line_no"]}: {m["line"]}')
-                print(f'    … {pv}')
+            for s in r["snippets"][:3]:
+                pv = " ⏤ ".join(s["lines"])
+                print(f'    L{s["start"]}-{s["end"]} … {pv}')
 
     return trimmed
 
@@ -186,11 +287,13 @@ schema_search_code = types.FunctionDeclaration(
             "name_globs": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING), description="Filename patterns, e.g. ['*.py','*test*']"),
             "extensions": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING), description="File extensions, e.g. ['.py','.go']"),
             "content_query": types.Schema(type=types.Type.STRING, description="Plain text or regex pattern to search within files"),
+            "content_queries": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING), description="Several plain text or regex patterns searched in a single pass; each match lists the patterns that hit it"),
             "use_regex": types.Schema(type=types.Type.BOOLEAN, description="Treat content_query as a regex"),
             "case_sensitive": types.Schema(type=types.Type.BOOLEAN, description="Case-sensitive search"),
             "max_results": types.Schema(type=types.Type.INTEGER, description="Max results to return"),
             "context_lines": types.Schema(type=types.Type.INTEGER, description="Lines of context around each match"),
             "extra_ignores": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING), description="Extra folder basenames to ignore"),
+            "max_chars": types.Schema(type=types.Type.INTEGER, description="Size budget for the returned results; lowest-scoring files lose their snippets first"),
             "verbose": types.Schema(type=types.Type.BOOLEAN, description="If verbose, prints all data, if not verbose, returns a succinct summary")
         },
         required=[],
@@ -0,0 +1,61 @@
+# functions/search_index.py
+import math
+import os
+import re
+
+# BM25 parameters (standard defaults)
+K1 = 1.2
+B = 0.75
+# extra score when a hit line defines the symbol (def/class) rather than uses it
+DEFINITION_BOOST = 1.5
+# files directly under root get this much; deeper files get proportionally less
+PROXIMITY_WEIGHT = 0.5
+
+_WORD_RE = re.compile(r"\w+")
+_DEF_RE = re.compile(r"^\s*(?:async\s+def|def|class)\s+(\w+)")
+
+
+def doc_length(path: str, lines: list[str], cache: dict) -> int:
+    """
+    Number of word tokens in a file, cached until its mtime or size changes.
+    cache maps abs path -> (mtime_ns, size, doc_len) and lives on the Workspace.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return sum(len(_WORD_RE.findall(l)) for l in lines)
+    cached = cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    n = sum(len(_WORD_RE.findall(l)) for l in lines)
+    cache[path] = (st.st_mtime_ns, st.st_size, n)
+    return n
+
+
+def bm25(tf: int, df: int, n_docs: int, doc_len: int, avgdl: float) -> float:
+    if tf <= 0 or df <= 0 or n_docs <= 0:
+        return 0.0
+    idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+    norm = K1 * (1.0 - B + B * (doc_len / avgdl if avgdl else 1.0))
+    return idf * tf * (K1 + 1.0) / (tf + norm)
+
+
+def definition_weight(line: str, rx) -> float:
+    """
+    1.0 if line is a def/class whose full name matches rx (e.g. "evaluate" or "def evaluate"),
+    0.5 if rx only hits part of the header (e.g. "evaluate" in "def evaluate_file"), else 0.0.
+    """
+    m = _DEF_RE.match(line)
+    if not m:
+        return 0.0
+    header = m.group(0)
+    hit = rx.search(header)
+    if not hit:
+        return 0.0
+    whole_name = hit.end() == len(header) and hit.start() <= m.start(1)
+    return 1.0 if whole_name or rx.fullmatch(m.group(1)) else 0.5
+
+
+def proximity(rel_to_root: str) -> float:
+    depth = rel_to_root.count(os.sep)
+    return PROXIMITY_WEIGHT / (1 + depth)
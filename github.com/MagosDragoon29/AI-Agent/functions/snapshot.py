@@ -0,0 +1,235 @@
+# functions/snapshot.py
+import hashlib
+import os
+import threading
+from collections import deque
+
+import config
+from .walker import DEFAULT_IGNORES, _dir_matchers, is_ignored, matchers_for
+
+
+class _DirState:
+    __slots__ = ("mtime_ns", "chain", "files", "subdirs", "digest")
+
+    def __init__(self, mtime_ns, chain, files, subdirs):
+        self.mtime_ns = mtime_ns
+        self.chain = chain
+        self.files: dict[str, tuple[int, int]] = files  # name -> (size, mtime_ns)
+        self.subdirs: list[str] = subdirs
+        self.digest = b""
+
+
+class WorkspaceSnapshot:
+    """
+    Merkle snapshot of a working tree: each directory hashes its children's (name, size, mtime)
+    and its subdirectories' hashes, so root_hash changes iff something below changed.
+
+    refresh() only re-stats directories and re-lists the ones whose mtime moved; write_file
+    reports its own writes through note_write(). Each detected change bumps `generation`, and
+    changed_since(g) returns the files touched after generation g so caches can invalidate
+    just those (PathIndex keeps its name buckets current this way). Other processes editing
+    a file in place do not change its directory's mtime; verify() re-stats every indexed file
+    (no listing, no reads) to catch those.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.generation = 0
+        self._dirs: dict[str, _DirState] = {}
+        self._history: deque[tuple[int, list[str]]] = deque(maxlen=config.SNAPSHOT_HISTORY)
+        self._lock = threading.Lock()
+        self._scan(self.root, matchers_for(self.root, self.root), [], [])
+        self._rehash(list(self._dirs))
+
+    @property
+    def root_hash(self) -> str:
+        return self._dirs[self.root].digest.hex() if self.root in self._dirs else ""
+
+    def _rel(self, dirpath, name):
+        return os.path.relpath(os.path.join(dirpath, name), self.root)
+
+    def _list(self, dirpath, chain):
+        """(mtime_ns, {file: (size, mtime_ns)}, [subdir]) for one directory, or None if it is gone."""
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+            entries = list(os.scandir(dirpath))
+        except OSError:
+            return None
+        files, subdirs = {}, []
+        for e in entries:
+            try:
+                is_dir = e.is_dir()
+                if is_ignored(chain, dirpath, e.name, is_dir, DEFAULT_IGNORES):
+                    continue
+                if is_dir:
+                    # like os.walk: symlinked directories are not followed
+                    if not e.is_symlink():
+                        subdirs.append(e.name)
+                    continue
+                st = e.stat()
+            except OSError:
+                continue
+            files[e.name] = (st.st_size, st.st_mtime_ns)
+        return mtime, files, sorted(subdirs)
+
+    def _scan(self, top, chain, changed, listed):
+        """
+        (Re)list top, build subtrees not seen before and drop vanished ones.
+        Appends changed files to `changed` and every directory listed to `listed`.
+        """
+        stack = [(top, chain)]
+        while stack:
+            dirpath, chain = stack.pop()
+            listed.append(dirpath)
+            listing = self._list(dirpath, chain)
+            if listing is None:
+                self._drop(dirpath, changed)
+                continue
+            mtime, files, subdirs = listing
+            old = self._dirs.get(dirpath)
+            old_files = old.files if old else {}
+            for name in files.keys() | old_files.keys():
+                if files.get(name) != old_files.get(name):
+                    changed.append(self._rel(dirpath, name))
+            if old:
+                for name in set(old.subdirs) - set(subdirs):
+                    self._drop(os.path.join(dirpath, name), changed)
+            self._dirs[dirpath] = _DirState(mtime, chain, files, subdirs)
+            for name in subdirs:
+                sub = os.path.join(dirpath, name)
+                if sub not in self._dirs:
+                    stack.append((sub, chain + _dir_matchers(sub)))
+
+    def _drop(self, dirpath, changed):
+        d = self._dirs.pop(dirpath, None)
+        if d is None:
+            return
+        changed.extend(self._rel(dirpath, name) for name in d.files)
+        for name in d.subdirs:
+            self._drop(os.path.join(dirpath, name), changed)
+
+    def _rehash(self, dirpaths):
+        """Recompute digests of dirpaths and their ancestors, deepest first."""
+        pending = set()
+        for d in dirpaths:
+            if d != self.root and not d.startswith(self.root + os.sep):
+                continue
+            while d not in pending:
+                pending.add(d)
+                if d == self.root:
+                    break
+                d = os.path.dirname(d)
+        for d in sorted(pending, key=lambda p: p.count(os.sep), reverse=True):
+            state = self._dirs.get(d)
+            if state is None:
+                continue
+            h = hashlib.blake2b(digest_size=16)
+            for name, (size, mtime) in sorted(state.files.items()):
+                h.update(f"f\0{name}\0{size}\0{mtime}\n".encode("utf-8", "surrogateescape"))
+            for name in state.subdirs:
+                sub = self._dirs.get(os.path.join(d, name))
+                h.update(f"d\0{name}\0".encode("utf-8", "surrogateescape") + (sub.digest if sub else b"") + b"\n")
+            state.digest = h.digest()
+
+    def _commit(self, changed, dirs):
+        # every re-listed directory gets a fresh _DirState, and an added or removed empty
+        # directory changes its parent's digest without changing any file: always rehash
+        self._rehash(dirs)
+        if not changed:
+            return
+        self.generation += 1
+        self._history.append((self.generation, sorted(set(changed))))
+
+    def refresh(self) -> int:
+        """Re-list directories whose mtime changed; returns the (possibly new) generation."""
+        with self._lock:
+            moved = []
+            for dirpath, d in self._dirs.items():
+                try:
+                    mtime = os.stat(dirpath).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime != d.mtime_ns:
+                    moved.append(dirpath)
+            changed, listed = [], []
+            # parents first, so a vanished subtree is dropped before its children are visited
+            for dirpath in sorted(moved, key=len):
+                d = self._dirs.get(dirpath)
+                if d is not None:
+                    self._scan(dirpath, d.chain, changed, listed)
+            self._commit(changed, listed)
+            return self.generation
+
+    def verify(self) -> int:
+        """refresh(), then re-stat every indexed file to catch in-place edits."""
+        self.refresh()
+        with self._lock:
+            changed, dirs = [], []
+            for dirpath, d in self._dirs.items():
+                for name, old in list(d.files.items()):
+                    try:
+                        st = os.stat(os.path.join(dirpath, name))
+                        now = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        now = None
+                    if now != old:
+                        if now is None:
+                            del d.files[name]
+                        else:
+                            d.files[name] = now
+                        changed.append(self._rel(dirpath, name))
+                        dirs.append(dirpath)
+            self._commit(changed, dirs)
+            return self.generation
+
+    def note_write(self, path: str) -> int:
+        """Record a file just written by the agent (write_file) without waiting for a refresh."""
+        full = os.path.abspath(path)
+        dirpath, name = os.path.split(full)
+        with self._lock:
+            d = self._dirs.get(dirpath)
+            # new or ignored directories are left to the next refresh()
+            if d is None or is_ignored(d.chain, dirpath, name, False, DEFAULT_IGNORES):
+                return self.generation
+            try:
+                st = os.stat(full)
+            except OSError:
+                return self.generation
+            if d.files.get(name) != (st.st_size, st.st_mtime_ns):
+                # the directory's own mtime is left alone so refresh() still re-lists it
+                d.files[name] = (st.st_size, st.st_mtime_ns)
+                self._commit([self._rel(dirpath, name)], [dirpath])
+            return self.generation
+
+    def files(self, rel_paths=None) -> list[str]:
+        """Indexed files relative to root: all of them, or just those of rel_paths still indexed."""
+        with self._lock:
+            if rel_paths is None:
+                return [self._rel(dirpath, name) for dirpath, d in self._dirs.items() for name in d.files]
+            found = []
+            for rel in rel_paths:
+                dirpath, name = os.path.split(os.path.join(self.root, rel))
+                d = self._dirs.get(dirpath)
+                if d is not None and name in d.files:
+                    found.append(rel)
+            return found
+
+    def has_dir(self, dirpath: str) -> bool:
+        """Whether dirpath is indexed (it is not if it, or a parent, is ignored)."""
+        return os.path.abspath(dirpath) in self._dirs
+
+    def changed_since(self, generation: int) -> list[str] | None:
+        """
+        Paths (relative to root) changed after `generation`, or None if that is older
+        than the kept history, in which case the caller should assume everything changed.
+        """
+        with self._lock:
+            if generation >= self.generation:
+                return []
+            if not self._history or self._history[0][0] > generation + 1:
+                return None
+            paths = set()
+            for gen, changed in self._history:
+                if gen > generation:
+                    paths.update(changed)
+            return sorted(paths)
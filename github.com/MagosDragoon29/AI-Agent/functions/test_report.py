@@ -0,0 +1,166 @@
+# functions/test_report.py
+import re
+import sys
+
+# at most this many failures are itemized in a summary; the rest are only counted
+MAX_FAILURES = 20
+MAX_MESSAGE_CHARS = 200
+
+_RULE_EQ = "=" * 70
+_RULE_DASH = "-" * 70
+
+_UNITTEST_BLOCK_RE = re.compile(
+    r"^={70}\n(FAIL|ERROR|UNEXPECTED SUCCESS): (.+?)\n-{70}\n(.*?)(?=^={70}$|^-{70}$|\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+_UNITTEST_RAN_RE = re.compile(r"^Ran (\d+) tests? in ([\d.]+)s$", re.MULTILINE)
+_UNITTEST_STATUS_RE = re.compile(r"^(OK|FAILED)(?: \((.*)\))?$", re.MULTILINE)
+_UNITTEST_NAME_RE = re.compile(r"^(\w+) \(([\w.]+)\)(.*)$")
+
+_PYTEST_TOTALS_RE = re.compile(r"^=+ (\d+ \w+.*?) in [\d.]+s(?: \([^)]*\))? =+$", re.MULTILINE)
+_PYTEST_SUMMARY_RE = re.compile(r"^(FAILED|ERROR) (\S+)(?: - (.*))?$", re.MULTILINE)
+_PYTEST_SECTION_RE = re.compile(r"^_{3,} (.+?) _{3,}$", re.MULTILINE)
+_PYTEST_LOCATION_RE = re.compile(r"^(\S+\.py):(\d+): (\w+)", re.MULTILINE)
+
+_FRAME_RE = re.compile(r'^\s*File "(.+?)", line (\d+), in (.+)$')
+# frames in these places are the harness, not the code under test
+_LIBRARY_MARKERS = ("/lib/python", "\\lib\\python", "site-packages", "<frozen")
+
+
+def _first_relevant_frame(traceback: str) -> tuple[str | None, str]:
+    """('path:line in func', message) from a Python traceback, preferring the innermost non-library frame."""
+    lines = traceback.rstrip().splitlines()
+    frames = []
+    for i, line in enumerate(lines):
+        m = _FRAME_RE.match(line)
+        if m:
+            frames.append((i, m))
+    frame = None
+    if frames:
+        own = [f for f in frames if not any(mark in f[1].group(1) for mark in _LIBRARY_MARKERS)]
+        i, m = (own or frames)[-1]
+        frame = f"{m.group(1)}:{m.group(2)} in {m.group(3)}"
+        last_frame_line = frames[-1][0]
+        rest = lines[last_frame_line + 1:]
+    else:
+        rest = lines
+    # the exception line follows the innermost frame's (indented) source line and carets;
+    # anything after it (assertion diffs) stays in the log
+    message = next((l.strip() for l in rest if l.strip() and not l[:1].isspace()), "")
+    if not message and lines:
+        message = lines[-1].strip()
+    return frame, message[:MAX_MESSAGE_CHARS]
+
+
+def _unittest_id(name: str) -> str:
+    # "test_x (pkg.Class.test_x)" on 3.11+, "test_x (pkg.Class)" before; keep subTest params
+    m = _UNITTEST_NAME_RE.match(name.strip())
+    if not m:
+        return name.strip()
+    method, where, extra = m.groups()
+    test_id = where if where.endswith("." + method) else f"{where}.{method}"
+    return test_id + extra
+
+
+def _parse_unittest(text: str) -> dict | None:
+    ran = _UNITTEST_RAN_RE.findall(text)
+    status = _UNITTEST_STATUS_RE.findall(text)
+    if not ran or not status:
+        return None
+    counts = {}
+    for item in (status[-1][1] or "").split(","):
+        key, _, value = item.strip().partition("=")
+        if value.isdigit():
+            counts[key.strip()] = int(value)
+    failures = []
+    for kind, name, body in _UNITTEST_BLOCK_RE.findall(text):
+        frame, message = _first_relevant_frame(body)
+        failures.append({"id": _unittest_id(name), "kind": kind.lower(), "frame": frame, "message": message})
+    total = int(ran[-1][0])
+    failed, errors = counts.get("failures", 0), counts.get("errors", 0)
+    skipped = counts.get("skipped", 0)
+    passed = total - failed - errors - counts.get("unexpected successes", 0)
+    if sys.version_info < (3, 12):
+        passed -= skipped  # older unittest counts skipped tests in "Ran N"
+    return {
+        "framework": "unittest",
+        "status": status[-1][0],
+        "ran": total,
+        "passed": max(passed, 0),
+        "failed": failed,
+        "errors": errors,
+        "skipped": skipped,
+        "failures": failures,
+    }
+
+
+def _section_end(text, marks, i):
+    # a section runs to the next one or the next "=== ... ===" banner
+    end = marks[i + 1].start() if i + 1 < len(marks) else len(text)
+    banner = text.find("\n=", marks[i].end(), end)
+    return end if banner == -1 else banner + 1
+
+
+def _parse_pytest(text: str) -> dict | None:
+    totals = _PYTEST_TOTALS_RE.findall(text)
+    if not totals:
+        return None
+    counts = {}
+    for item in totals[-1].split(","):
+        n, _, key = item.strip().partition(" ")
+        if n.isdigit():
+            counts[key.strip()] = int(n)
+    errors = counts.get("errors", counts.get("error", 0))
+
+    # per-test detail sections: "____ Class.test_name ____" ... "path.py:12: AssertionError"
+    sections = {}
+    marks = list(_PYTEST_SECTION_RE.finditer(text))
+    for i, m in enumerate(marks):
+        sections[m.group(1)] = text[m.end():_section_end(text, marks, i)]
+
+    failures = []
+    for kind, test_id, message in _PYTEST_SUMMARY_RE.findall(text):
+        title = ".".join(test_id.split("::")[1:]) or test_id
+        body = sections.get(title) or sections.get(title.rpartition(".")[2]) or ""
+        locs = _PYTEST_LOCATION_RE.findall(body)
+        frame = f"{locs[-1][0]}:{locs[-1][1]}" if locs else None
+        if not message and body:
+            errs = [l[1:].strip() for l in body.splitlines() if l.startswith("E ")]
+            message = " ".join(errs)
+        failures.append({"id": test_id, "kind": "fail" if kind == "FAILED" else "error", "frame": frame, "message": (message or "")[:MAX_MESSAGE_CHARS]})
+    failed = counts.get("failed", 0)
+    return {
+        "framework": "pytest",
+        "status": "FAILED" if failed or errors else "OK",
+        "ran": failed + counts.get("passed", 0) + counts.get("xfailed", 0) + counts.get("xpassed", 0),
+        "passed": counts.get("passed", 0),
+        "failed": failed,
+        "errors": errors,
+        "skipped": counts.get("skipped", 0),
+        "failures": failures,
+    }
+
+
+def parse_test_output(text: str) -> dict | None:
+    """
+    Counts, failing test ids and the first relevant frame + message per failure from
+    unittest or pytest console output. None if the text looks like neither.
+    """
+    report = _parse_unittest(text) or _parse_pytest(text)
+    if report and len(report["failures"]) > MAX_FAILURES:
+        report["more_failures"] = len(report["failures"]) - MAX_FAILURES
+        report["failures"] = report["failures"][:MAX_FAILURES]
+    return report
+
+
+def failure_block(text: str, test_id: str) -> str | None:
+    """The full log section for one failing test (unittest or pytest), or None."""
+    for kind, name, body in _UNITTEST_BLOCK_RE.findall(text):
+        if _unittest_id(name) == test_id or name.strip() == test_id:
+            return f"{_RULE_EQ}\n{kind}: {name}\n{_RULE_DASH}\n{body}"
+    title = ".".join(test_id.split("::")[1:]) or test_id
+    marks = list(_PYTEST_SECTION_RE.finditer(text))
+    for i, m in enumerate(marks):
+        if m.group(1) in (title, title.rpartition(".")[2]):
+            return text[m.start():_section_end(text, marks, i)]
+    return None
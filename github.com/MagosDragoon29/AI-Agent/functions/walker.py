@@ -0,0 +1,164 @@
+# functions/walker.py
+import os
+import re
+
+DEFAULT_IGNORES = {
+    ".git", ".venv", "__pycache__", "node_modules", ".mypy_cache", ".pytest_cache", ".idea", ".vscode", "dist", "build"
+}
+IGNORE_FILES = (".gitignore", ".ignore")
+
+# ignore file path -> (mtime_ns, size, IgnoreMatcher)
+_MATCHER_CACHE: dict[str, tuple[int, int, "IgnoreMatcher"]] = {}
+
+
+def _translate(pat: str) -> str:
+    """gitignore glob -> regex fragment ('*' and '?' stop at '/', '**' crosses directories)."""
+    i, n, out = 0, len(pat), []
+    while i < n:
+        c = pat[i]
+        if c == "*":
+            if pat.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pat.startswith("**", i):
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pat.find("]", i + 2)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pat[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+                continue
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pat[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreMatcher:
+    """Compiled rules from one .gitignore/.ignore file, matched against paths relative to its directory."""
+
+    def __init__(self, lines):
+        self.rules = []  # (regex, negate, dir_only)
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # a slash anywhere but the end anchors the pattern to this directory
+            anchored = "/" in line
+            rx = ("" if anchored else "(?:.*/)?") + _translate(line.lstrip("/"))
+            self.rules.append((re.compile(f"^{rx}$"), negate, dir_only))
+
+        # without negations, "last match wins" reduces to "any match", so one regex per kind suffices
+        self._fast = None
+        if self.rules and not any(neg for _, neg, _ in self.rules):
+            all_rx = "|".join(r.pattern for r, _, _ in self.rules)
+            file_rx = "|".join(r.pattern for r, _, d in self.rules if not d)
+            self._fast = (re.compile(all_rx), re.compile(file_rx) if file_rx else None)
+
+    def match(self, rel: str, is_dir: bool):
+        """True (ignored), False (re-included by '!'), or None (no rule applies)."""
+        if self._fast:
+            rx = self._fast[0] if is_dir else self._fast[1]
+            return True if rx and rx.match(rel) else None
+        for rx, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if rx.match(rel):
+                return not negate
+        return None
+
+
+def _load_matcher(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _MATCHER_CACHE.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            matcher = IgnoreMatcher(f.readlines())
+    except OSError:
+        return None
+    _MATCHER_CACHE[path] = (st.st_mtime_ns, st.st_size, matcher)
+    return matcher
+
+
+def _dir_matchers(dirpath: str) -> list:
+    out = []
+    for name in IGNORE_FILES:
+        m = _load_matcher(os.path.join(dirpath, name))
+        if m and m.rules:
+            out.append((dirpath, m))
+    return out
+
+
+def matchers_for(root: str, dirpath: str) -> list:
+    """Ignore matchers that apply inside dirpath, from root down (outermost first)."""
+    root = os.path.abspath(root)
+    dirpath = os.path.abspath(dirpath)
+    chain = []
+    rel = os.path.relpath(dirpath, root)
+    parts = [] if rel == "." else rel.split(os.sep)
+    current = root
+    chain.extend(_dir_matchers(current))
+    for part in parts:
+        current = os.path.join(current, part)
+        chain.extend(_dir_matchers(current))
+    return chain
+
+
+def is_ignored(chain: list, dirpath: str, name: str, is_dir: bool, names=DEFAULT_IGNORES) -> bool:
+    if is_dir and name in names:
+        return True
+    full = os.path.join(dirpath, name)
+    # deeper ignore files override shallower ones
+    for base, matcher in reversed(chain):
+        verdict = matcher.match(os.path.relpath(full, base).replace(os.sep, "/"), is_dir)
+        if verdict is not None:
+            return verdict
+    return False
+
+
+def walk(top: str, root: str | None = None, extra_ignores=None):
+    """
+    os.walk(top) that prunes DEFAULT_IGNORES, extra_ignores and anything matched by
+    .gitignore/.ignore files between root (default: top) and each directory.
+    Ignored directories are removed before descending, so their subtrees are never listed.
+    """
+    names = DEFAULT_IGNORES | set(extra_ignores) if extra_ignores else DEFAULT_IGNORES
+    top = os.path.abspath(top)
+    chains = {top: matchers_for(root or top, top)}
+    for dirpath, dirnames, filenames in os.walk(top):
+        chain = chains.pop(dirpath, None)
+        if chain is None:
+            chain = matchers_for(root or top, dirpath)
+        dirnames[:] = [d for d in dirnames if not is_ignored(chain, dirpath, d, True, names)]
+        filenames[:] = [f for f in filenames if not is_ignored(chain, dirpath, f, False, names)]
+        for d in dirnames:
+            sub = os.path.join(dirpath, d)
+            chains[sub] = chain + _dir_matchers(sub)
+        yield dirpath, dirnames, filenames
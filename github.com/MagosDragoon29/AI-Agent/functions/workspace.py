@@ -0,0 +1,112 @@
+# functions/workspace.py
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+import config
+from .file_info import FileClassifier
+from .path_index import PathIndex
+from .prefetch import Prefetcher
+from .snapshot import WorkspaceSnapshot
+
+
+class Workspace:
+    """
+    One working tree: its root plus every cache tied to it. Sessions share a workspace's
+    caches but each works on its own fork() so last-search state never leaks between them.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.files = FileClassifier()
+        self.doc_lengths: dict[str, tuple[int, int, int]] = {}  # see search_index.doc_length
+        self.prefetch = Prefetcher(config.PREFETCH_MAX_BYTES, self.files)
+        # file name indexes for name-only searches, one per extra_ignores set
+        self.path_indexes: dict[tuple[str, ...], PathIndex] = {}
+        self._index_lock = threading.Lock()
+        # change tracking for the whole tree, built on first use and shared with forks (see snapshot())
+        self._snapshots: dict[str, WorkspaceSnapshot] = {}
+        # results of this session's last search_code call, used to resolve basenames
+        self.last_search_results: list[dict] = []
+
+    def __repr__(self):
+        return f"Workspace({self.root!r})"
+
+    def fork(self) -> "Workspace":
+        """Same root and caches, separate last-search state (one per agent session)."""
+        session = copy.copy(self)
+        session.last_search_results = []
+        return session
+
+    def path_index(self, extra_ignores=None) -> PathIndex:
+        """The file name index for this root, built on first use from the shared snapshot()."""
+        key = tuple(sorted(extra_ignores or ()))
+        snapshot = self.snapshot()
+        with self._index_lock:
+            index = self.path_indexes.get(key)
+            if index is None:
+                index = self.path_indexes[key] = PathIndex(snapshot, extra_ignores)
+            return index
+
+    def snapshot(self) -> WorkspaceSnapshot:
+        """The tree's Merkle snapshot, built on first use; refresh() it to pick up changes."""
+        with self._index_lock:
+            snapshot = self._snapshots.get(self.root)
+            if snapshot is None:
+                snapshot = self._snapshots[self.root] = WorkspaceSnapshot(self.root)
+            return snapshot
+
+    def note_write(self, path: str):
+        """write_file just wrote path: update the snapshot, if any, and recheck the path indexes."""
+        snapshot = self._snapshots.get(self.root)
+        if snapshot is not None:
+            snapshot.note_write(path)
+        self.invalidate_paths()
+
+    def forget(self, rel_paths: list[str]):
+        """Drop cached state for these files only (paths relative to root)."""
+        for rel in rel_paths:
+            full = os.path.join(self.root, rel)
+            self.files.discard(full)
+            self.doc_lengths.pop(full, None)
+            self.prefetch.discard(full)
+        if rel_paths:
+            self.invalidate_paths()
+
+    def invalidate_paths(self):
+        """Make the next name-only search refresh the snapshot (files were just written)."""
+        for index in list(self.path_indexes.values()):
+            index.invalidate()
+
+    def clear(self):
+        """Drop cached state, e.g. after the tree changed on disk."""
+        self.files.clear()
+        self.doc_lengths.clear()
+        self.prefetch.clear()
+        self.path_indexes.clear()
+        self._snapshots.clear()
+        self.last_search_results = []
+
+
+_WORKSPACES: OrderedDict[str, Workspace] = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def get_workspace(root: str) -> Workspace:
+    """Shared Workspace for root; the least recently used ones beyond config.MAX_WORKSPACES are evicted."""
+    key = os.path.abspath(root)
+    with _LOCK:
+        ws = _WORKSPACES.get(key)
+        if ws is None:
+            ws = _WORKSPACES[key] = Workspace(key)
+            while len(_WORKSPACES) > config.MAX_WORKSPACES:
+                _WORKSPACES.popitem(last=False)
+        else:
+            _WORKSPACES.move_to_end(key)
+        return ws
+
+
+def all_workspaces() -> list[Workspace]:
+    with _LOCK:
+        return list(_WORKSPACES.values())
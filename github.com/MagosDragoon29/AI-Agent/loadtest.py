@@ -0,0 +1,90 @@
+# loadtest.py
+"""
+Drive many agent sessions against FakeBackend and report agent-side overhead.
+
+Usage: python loadtest.py [--sessions N] [--concurrency N] [--script turns.json]
+
+Overhead per step is session wall time minus time spent inside the backend, divided by
+the number of model calls: orchestration, tool dispatch, history handling and any retry
+backoff after injected 503s.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main as agent
+import session_io
+from backends import FakeBackend, ModelBackend
+from functions.workspace import all_workspaces
+
+
+class _TimedBackend(ModelBackend):
+    """Per-session wrapper that records time spent in the model and the number of calls."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.model_time = 0.0
+        self.calls = 0
+
+    def generate(self, contents, config):
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            return self.inner.generate(contents, config)
+        finally:
+            self.model_time += time.perf_counter() - started
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(backend, sessions, concurrency, query="Where is Calculator.evaluate defined?"):
+    def _one(_):
+        timed = _TimedBackend(backend)
+        started = time.perf_counter()
+        with session_io.capture():
+            # no fast-path router: the point is to exercise the model loop
+            outcome = agent.run_session(timed, query, router=None)
+        wall = time.perf_counter() - started
+        return outcome["status"], wall, timed.model_time, timed.calls, outcome.get("tool_calls", 0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        records = list(pool.map(_one, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    per_step_ms = [(wall - model) / calls * 1000 for _, wall, model, calls, _ in records if calls]
+    statuses = {}
+    for status, *_ in records:
+        statuses[status] = statuses.get(status, 0) + 1
+    steps = sum(r[3] for r in records)
+    tools = sum(r[4] for r in records)
+
+    print(f"sessions: {sessions} (concurrency {concurrency}) in {elapsed:.2f}s -> {sessions / elapsed:.1f} sessions/s")
+    print(f"status: {statuses}")
+    print(f"model calls: {steps}, tool calls: {tools}")
+    print(
+        "agent overhead per step: "
+        f"mean={statistics.fmean(per_step_ms) if per_step_ms else 0.0:.2f}ms "
+        f"p50={_percentile(per_step_ms, 50):.2f}ms p95={_percentile(per_step_ms, 95):.2f}ms "
+        f"max={max(per_step_ms, default=0.0):.2f}ms"
+    )
+    for ws in all_workspaces():
+        print(f"prefetch {ws.root}: {ws.prefetch.stats()}")
+
+
+def main():
+    args = sys.argv
+    sessions = int(args[args.index("--sessions") + 1]) if "--sessions" in args else 1000
+    concurrency = int(args[args.index("--concurrency") + 1]) if "--concurrency" in args else 16
+    backend = FakeBackend.from_file(args[args.index("--script") + 1]) if "--script" in args else FakeBackend()
+    run(backend, sessions, concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,27 @@
 # ./main.py
-import os
+import json
 import sys
+import threading
 import time
-from dotenv import load_dotenv
-from google import genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from google.genai import types
 import config
+from backends import backend_from_args
+from checkpoint import Checkpoint
+from profiling import Profiler
+from router import DEFAULT_ROUTER, Router
 from functions import (
     schema_get_files_info,
     schema_run_python_file,
     schema_get_file_content,
     schema_write_file,
     schema_search_code,
+    schema_get_run_log,
 )
 from functions.call_function import call_function
+from functions.workspace import Workspace, get_workspace
+import session_io
 
 SYSTEM_PROMPT = config.SYSTEM_PROMPT
 
@@ -23,6 +31,7 @@ available_functions = [
     schema_run_python_file,
     schema_write_file,
     schema_search_code,
+    schema_get_run_log,
 ]
 
 tools = types.Tool(function_declarations=available_functions)
@@ -83,7 +92,7 @@ def _tool_to_user(tool_msg, fallback_name: str):
     )
 
 
-def _fallback_route(query: str, verbose: bool):
+def _fallback_route(query: str, verbose: bool, workspace=None):
     """Heuristic fallback if the model does not emit function_calls."""
     q = query.lower().strip()
     from types import SimpleNamespace
@@ -94,13 +103,13 @@ def _fallback_route(query: str, verbose: bool):
     if q.startswith("run "):
         # e.g., "run tests.py"
         fname = query.split(" ", 1)[1].strip()
-        return call_function(_mk("schema_run_python_file", filename=fname), verbose=verbose)
+        return call_function(_mk("schema_run_python_file", filename=fname), verbose=verbose, workspace=workspace)
 
     if "get" in q and "contents" in q:
         # e.g., "get the contents of lorem.txt"
         # naive filename grab: last token that looks like a file
         fname = q.split()[-1]
-        return call_function(_mk("schema_get_file_content", path=fname), verbose=verbose)
+        return call_function(_mk("schema_get_file_content", path=fname), verbose=verbose, workspace=workspace)
 
     if q.startswith("create a new readme.md") or ("create" in q and "readme.md" in q):
         # e.g., "create a new README.md file with the contents '# calculator'"
@@ -111,10 +120,10 @@ def _fallback_route(query: str, verbose: bool):
                 contents = query.split("'", 1)[1].rsplit("'", 1)[0]
             except Exception:
                 pass
-        return call_function(_mk("schema_write_file", path="README.md", contents=contents), verbose=verbose)
+        return call_function(_mk("schema_write_file", path="README.md", contents=contents), verbose=verbose, workspace=workspace)
 
     if "what files are in the root" in q or "list" in q:
-        return call_function(_mk("schema_get_files_info", directory="."), verbose=verbose)
+        return call_function(_mk("schema_get_files_info", directory="."), verbose=verbose, workspace=workspace)
 
     # Nothing matched → tell the user something
     return "I didn’t get a tool call and no fallback matched your query."
@@ -138,33 +147,96 @@ def _best_eval_hit(search_results):
     py_hits = [r["path"] for r in search_results if str(r.get("path","")).endswith(".py")]
     return py_hits[0] if len(py_hits) == 1 else None
 
-def main():
-    print("Hello from ai-agent!")
-    if len(sys.argv) < 2:
-        print("No query provided")
-        sys.exit(1)
+class RateLimiter:
+    """Thread-safe minimum spacing between model calls, shared by every session in the process."""
 
-    variables = sys.argv
-    query = variables[1]
-    verbose = "--verbose" in variables
+    def __init__(self, max_per_second: float):
+        self._interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def run_session(
+    backend,
+    query: str,
+    verbose: bool = False,
+    limiter: RateLimiter | None = None,
+    workspace: Workspace | None = None,
+    router: Router | None = None,
+    checkpoint: Checkpoint | None = None,
+    profiler: Profiler | None = None,
+) -> dict:
+    """
+    Run one agent session against a model backend (see backends.py).
+    If router recognizes the query confidently it is answered from the tool layer
+    without any model call, and the result carries "routed": <intent>.
+    With a checkpoint, every completed step (model turns, tool results, totals) is persisted
+    once the model is called; a checkpoint restored by
+    Checkpoint.load() continues from its saved messages and totals instead of from query.
+    With a profiler, every model call and tool dispatch is profiled as its own step.
+    Tools operate on a fork of workspace (default: config.default_work_dir), so concurrent
+    sessions share caches but not last-search state.
+    Returns {"status": "ok" | "error" | "max_iterations", "final": str | None,
+             "tool_calls": int, "prompt_tokens": int, "response_tokens": int}.
+    """
     messages = [
         types.Content(
             role='user',
             parts=[types.Part.from_text(text=query)]
         )
     ]
+    workspace = (workspace or get_workspace(config.default_work_dir)).fork()
+    final_text = None
+    stats = {"tool_calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+    start = 0
+    if checkpoint and checkpoint.next_step:
+        messages = list(checkpoint.messages)
+        stats.update(checkpoint.stats)
+        start = checkpoint.next_step
+        router = None  # already went to the model the first time
+
+    def _end(status):
+        if checkpoint:
+            checkpoint.record_end(status, final_text)
+        return {"status": status, "final": final_text, **stats}
 
-    load_dotenv("aiconfig.env")
-    api_key = os.environ.get("GEMINI_API_KEY")
-    client = genai.Client(api_key=api_key)
+    if router:
+        with profiler.step("router") if profiler else nullcontext():
+            routed = router.route(query, workspace, verbose=verbose)
+        if routed:
+            intent, tool_msg, final_text = routed
+            if tool_msg is not None:
+                stats["tool_calls"] += 1
+                _print_tool_message(tool_msg)
+            # never went to the model: nothing to resume, so the checkpoint is never written
+            return {"status": "ok", "final": final_text, "routed": intent, **stats}
 
-    for i in range(20):
+    for i in range(start, start + config.MAX_ITERATIONS):
+        step_start = len(messages)
+        step_tools = []
+        answered = False
         try:
-            resp = client.models.generate_content(
-            model="gemini-2.0-flash-001",
-            contents=messages,
-            config=generation_config,
-        )
+            if limiter:
+                limiter.acquire()
+            started = time.perf_counter()
+            with profiler.step("model", str(i)) if profiler else nullcontext():
+                resp = backend.generate(messages, generation_config)
+            if router:
+                router.observe_model_call(time.perf_counter() - started)
+            um = getattr(resp, "usage_metadata", None)
+            if um:
+                stats["prompt_tokens"] += um.prompt_token_count or 0
+                stats["response_tokens"] += um.candidates_token_count or 0
             for cand in getattr(resp, 'candidates', []) or []:
                 c = getattr(cand, "content", None)
                 if c and getattr(c, "role", None) in ("model", "user"):
@@ -175,7 +247,7 @@ def main():
                 if final_text:
                     print("Final response:")
                     print(final_text)
-                    break
+                    answered = True
         except Exception as e:
             if "UNAVAILABLE" in str(e) or "503" in str(e):
                 print("Transient model overload; retrying shortly...")
@@ -183,7 +255,14 @@ def main():
                 continue
             else:
                 print(f"Generation failed: {e}")
-                sys.exit(1)
+                final_text = None
+                return _end("error")
+
+        # outside the try: a checkpoint write failure is not a generation failure
+        if answered:
+            if checkpoint:
+                checkpoint.record_step(i, messages[step_start:], step_tools, stats)
+            break
 
         if resp.function_calls and len(resp.function_calls) > 0:
             if verbose:
@@ -200,10 +279,13 @@ def main():
                     print(f"Function called: {call.name}")
                     print(f"Arguments: {call.args}")
 
-                tool_msg = call_function(call, verbose=verbose)
+                with profiler.step("tool", call.name.removeprefix("schema_")) if profiler else nullcontext():
+                    tool_msg = call_function(call, verbose=verbose, workspace=workspace)
+                stats["tool_calls"] += 1
                 _print_tool_message(tool_msg)
                 #messages.append(_tool_to_user(tool_msg, call.name))
                 payload = _get_tool_payload(tool_msg)
+                step_tools.append({"name": call.name, "args": dict(call.args or {}), "response": payload})
                 # capture path from a search_code result
                 if call.name == "schema_search_code" and payload and "result" in payload:
                     maybe = _best_eval_hit(payload["result"])
@@ -215,7 +297,8 @@ def main():
 
                 # If we’ve found a good path and opened its content, finalize and stop
                 if found_path and opened_file:
-                    print(f"Answer: Calculator.evaluate is defined in {found_path}.")
+                    final_text = f"Calculator.evaluate is defined in {found_path}."
+                    print(f"Answer: {final_text}")
                     break
                 
         else:
@@ -225,10 +308,173 @@ def main():
                 # If the model produced text, show it for debugging
                 if getattr(resp, "text", None):
                     print(resp.text)
-            tool_msg = _fallback_route(query, verbose=verbose)
+            with profiler.step("tool", "fallback") if profiler else nullcontext():
+                tool_msg = _fallback_route(query, verbose=verbose, workspace=workspace)
             _print_tool_message(tool_msg)
+            step_tools.append({"name": "fallback", "args": {}, "response": _get_tool_payload(tool_msg)})
+
+        if checkpoint:
+            checkpoint.record_step(i, messages[step_start:], step_tools, stats)
     else:
         print("Max iterations reached without a final response.")
+        return _end("max_iterations")
+
+    return _end("ok")
+
+
+def _load_batch(path: str) -> list[dict]:
+    """
+    Read a JSONL batch: each line is {"query": ..., "id": optional, "workspace": optional root}
+    or a bare JSON string. Raises ValueError naming every malformed line.
+    """
+    items, bad = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                bad.append(f"line {n + 1}: invalid JSON ({e})")
+                continue
+            if isinstance(entry, str):
+                entry = {"query": entry}
+            if not isinstance(entry, dict) or not isinstance(entry.get("query"), str) or not entry["query"].strip():
+                bad.append(f"line {n + 1}: expected a query string or an object with a non-empty \"query\"")
+                continue
+            if "workspace" in entry and not isinstance(entry["workspace"], (str, type(None))):
+                bad.append(f"line {n + 1}: \"workspace\" must be a path")
+                continue
+            entry.setdefault("id", n)
+            items.append(entry)
+    if bad:
+        raise ValueError(f"{path}: " + "; ".join(bad))
+    return items
+
+
+def run_batch(
+    backend,
+    path: str,
+    output: str,
+    concurrency: int = 4,
+    verbose: bool = False,
+    workspace: Workspace | None = None,
+    router: Router | None = None,
+) -> int:
+    """
+    Run every query in a JSONL file as a separate session in this process, sharing the
+    backend, rate limiter, router and tool caches. Items with a "workspace" root run there,
+    the rest in workspace. Writes one JSON result line per query to output
+    (in completion order) and returns the number of sessions that did not finish "ok".
+    """
+    items = _load_batch(path)
+    limiter = RateLimiter(config.MODEL_MAX_CALLS_PER_SECOND)
+
+    def _one(item):
+        started = time.perf_counter()
+        # keep each session's prints out of the shared stdout
+        with session_io.capture():
+            try:
+                ws = get_workspace(item["workspace"]) if item.get("workspace") else workspace
+                outcome = run_session(backend, item["query"], verbose=verbose, limiter=limiter, workspace=ws, router=router)
+            except Exception as e:
+                # same fields as a finished session, so every output line has one schema
+                outcome = {"status": "error", "final": f"Session failed: {e}",
+                           "tool_calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+        return {
+            "id": item["id"],
+            "query": item["query"],
+            **outcome,
+            "latency_s": round(time.perf_counter() - started, 3),
+        }
+
+    failures = 0
+    with open(output, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_one, item) for item in items]
+        for fut in as_completed(futures):
+            record = fut.result()
+            if record["status"] != "ok":
+                failures += 1
+            # only this thread writes: workers hand their records back through the futures
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            print(f"[batch] {record['id']}: {record['status']} ({record['latency_s']}s)")
+
+    print(f"Batch complete: {len(items)} queries, {failures} not ok -> {output}")
+    if router:
+        print(f"Router: {router.stats()}")
+    return failures
+
+
+def main():
+    print("Hello from ai-agent!")
+    if len(sys.argv) < 2:
+        print("No query provided")
+        sys.exit(1)
+
+    variables = sys.argv
+    query = variables[1]
+    verbose = "--verbose" in variables
+    # --router answers deterministic queries (run X.py, list files, ...) without the model
+    router = DEFAULT_ROUTER if "--router" in variables else None
+    # --workspace PATH serves another tree instead of config.default_work_dir
+    workspace = get_workspace(variables[variables.index("--workspace") + 1]) if "--workspace" in variables else None
+
+    if query == "--batch":
+        if len(variables) < 3:
+            print("Usage: python main.py --batch queries.jsonl [--concurrency N] [--output results.jsonl] [--workspace PATH] [--router]")
+            sys.exit(1)
+        concurrency = config.BATCH_CONCURRENCY
+        if "--concurrency" in variables:
+            value = variables[variables.index("--concurrency") + 1:][:1]
+            if not value or not value[0].isdigit() or int(value[0]) < 1:
+                print(f"Usage: --concurrency needs a positive integer, got {value[0] if value else 'nothing'}")
+                sys.exit(1)
+            concurrency = int(value[0])
+        output = variables[variables.index("--output") + 1] if "--output" in variables else "batch_results.jsonl"
+        try:
+            failures = run_batch(backend_from_args(variables), variables[2], output, concurrency=concurrency, verbose=verbose, workspace=workspace, router=router)
+        except ValueError as e:
+            print(f"Bad batch file: {e}")
+            sys.exit(1)
+        sys.exit(1 if failures else 0)
+
+    if query == "--resume":
+        if len(variables) < 3:
+            print("Usage: python main.py --resume SESSION [--backend ...] [--verbose]")
+            sys.exit(1)
+        checkpoint = Checkpoint.load(variables[2])
+        if checkpoint is None:
+            print(f"No checkpoint for session {variables[2]}")
+            sys.exit(1)
+        if checkpoint.status == "ok":
+            print("Session already finished. Final response:")
+            print(checkpoint.final)
+            return
+        print(f"Resuming session {checkpoint.session_id} at step {checkpoint.next_step} "
+              f"({sum(len(t) for t in checkpoint.tool_results)} tool results restored)")
+        query = checkpoint.query
+        workspace = get_workspace(checkpoint.workspace_root)
+    else:
+        checkpoint = Checkpoint.create(query, (workspace or get_workspace(config.default_work_dir)).root)
+
+    # --profile DIR writes per-step cProfile stats and an allocation report to DIR
+    profiler = Profiler(variables[variables.index("--profile") + 1]) if "--profile" in variables else None
+
+    # --backend fake [--script turns.json] runs against a local scripted model
+    outcome = run_session(
+        backend_from_args(variables), query, verbose=verbose, workspace=workspace, router=router,
+        checkpoint=checkpoint, profiler=profiler,
+    )
+    if profiler:
+        print(profiler.write_report())
+    if verbose and router:
+        print(f"Router: {router.stats()}")
+    if outcome["status"] != "ok" and not outcome.get("routed"):
+        print(f"Resume with: python main.py --resume {checkpoint.session_id}")
+    if outcome["status"] == "error":
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,87 @@
+# profiling.py
+"""
+Per-step profiling for main.py --profile DIR.
+
+Each model call and each tool dispatch runs under its own cProfile.Profile and between two
+tracemalloc snapshots. Every step writes DIR/<nn>-<kind>-<label>.pstats (open with
+`python -m pstats`); write_report() adds DIR/allocations.txt with the top-N allocation
+sites per step and DIR/summary.txt with wall time per step and per kind.
+tracemalloc only starts when a Profiler is created (and is only stopped again if that Profiler
+started it); without one, run_session pays a None check.
+"""
+import cProfile
+import os
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import config
+
+_SKIP = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+class Profiler:
+    def __init__(self, out_dir: str, top_n: int = config.PROFILE_TOP_N):
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self.steps = []  # (file stem, kind, wall seconds, peak bytes above step start, top allocation stats)
+        os.makedirs(out_dir, exist_ok=True)
+        # a caller (or test harness) already tracing keeps its tracing after write_report()
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def step(self, kind: str, label: str = ""):
+        """Profile one model call ("model") or tool dispatch ("tool") named label."""
+        stem = f"{len(self.steps):02d}-{kind}"
+        if label:
+            stem += "-" + re.sub(r"[^\w.-]+", "_", label)
+        before = tracemalloc.take_snapshot().filter_traces(_SKIP)
+        tracemalloc.reset_peak()
+        floor = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - floor
+            after = tracemalloc.take_snapshot().filter_traces(_SKIP)
+            profile.dump_stats(os.path.join(self.out_dir, stem + ".pstats"))
+            top = [s for s in after.compare_to(before, "lineno") if s.size_diff > 0][:self.top_n]
+            self.steps.append((stem, kind, wall, peak, top))
+
+    def write_report(self) -> str:
+        """Write allocations.txt and summary.txt; returns a one-line summary."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        with open(os.path.join(self.out_dir, "allocations.txt"), "w", encoding="utf-8") as f:
+            for stem, kind, wall, peak, top in self.steps:
+                f.write(f"== {stem}  wall={wall:.3f}s  peak=+{peak / 1024:.1f}KiB\n")
+                for stat in top:
+                    frame = stat.traceback[0]
+                    f.write(f"  {stat.size_diff / 1024:>9.1f} KiB  {stat.count_diff:>+7} blocks  {frame.filename}:{frame.lineno}\n")
+                f.write("\n")
+
+        totals = {}
+        for _, kind, wall, _, _ in self.steps:
+            count, seconds = totals.get(kind, (0, 0.0))
+            totals[kind] = (count + 1, seconds + wall)
+        with open(os.path.join(self.out_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            for kind, (count, seconds) in sorted(totals.items()):
+                f.write(f"{kind:<8} steps={count:<4} wall={seconds:.3f}s\n")
+            f.write("\n")
+            for stem, _, wall, peak, _ in self.steps:
+                f.write(f"{stem:<48} {wall:>8.3f}s  {peak / 1024:>9.1f}KiB\n")
+        parts = ", ".join(f"{kind} {seconds:.2f}s over {count}" for kind, (count, seconds) in sorted(totals.items()))
+        return f"Profile written to {self.out_dir}: {parts or 'no steps'}"
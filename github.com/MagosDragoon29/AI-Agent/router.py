@@ -0,0 +1,226 @@
+# router.py
+"""
+Pre-model fast path: recognizes deterministic queries (list files, read a file, run a
+script or the tests, "where is X defined") and answers them straight from the tool layer.
+Anything below the confidence threshold is handed to the model as usual.
+Opt-in: main.py and daemon.py only route with --router; run_session and run_batch only
+with an explicit router (e.g. DEFAULT_ROUTER).
+
+Rules are pluggable: a rule is a callable (query, workspace) -> RouteMatch | None.
+"""
+import os
+import re
+import threading
+from types import SimpleNamespace
+
+import config
+from functions.call_function import call_function
+from functions.search_code import search_code
+
+
+class RouteMatch:
+    def __init__(self, intent: str, confidence: float, run):
+        self.intent = intent
+        self.confidence = confidence
+        # (workspace, verbose) -> (tool Content or None, final answer text)
+        self.run = run
+
+
+def _call(name, **args):
+    return SimpleNamespace(name=name, args=args)
+
+
+def _tool(name, workspace, verbose, **args):
+    msg = call_function(_call(name, **args), verbose=verbose, workspace=workspace)
+    payload = None
+    for p in (msg.parts or []):
+        fr = getattr(p, "function_response", None)
+        if fr and isinstance(fr.response, dict):
+            payload = fr.response
+    text = None
+    if payload:
+        text = payload.get("result") if "result" in payload else payload.get("error")
+    return msg, text if isinstance(text, str) else None
+
+
+_RUN_RE = re.compile(r"^(?:please\s+)?run\s+(\S+\.py)((?:\s+\S+)*)\s*$", re.IGNORECASE)
+_TESTS_RE = re.compile(r"^(?:please\s+)?(?:run|execute)\s+(?:the\s+|all\s+)?(?:unit\s+)?tests?[.!]?$", re.IGNORECASE)
+_READ_RE = re.compile(
+    r"^(?:please\s+)?(?:get|show|read|print|cat|open)\s+(?:me\s+)?(?:the\s+)?(?:contents?\s+of\s+)?(?:the\s+file\s+)?([\w./-]+\.\w+)[.!?]?$",
+    re.IGNORECASE,
+)
+_LIST_RE = re.compile(
+    r"^(?:please\s+)?(?:list(?:\s+the)?\s+files|ls|what\s+files\s+are)(?:\s+(?:in|under)\s+(?:the\s+)?([\w./-]+))?[?.!]?$",
+    re.IGNORECASE,
+)
+_WHERE_RE = re.compile(
+    r"^where\s+is\s+(?:the\s+)?(?:function\s+|method\s+|class\s+)?`?([A-Za-z_][\w.]*)`?(?:\(\))?\s+defined\??$",
+    re.IGNORECASE,
+)
+
+
+def run_rule(query, workspace):
+    m = _RUN_RE.match(query.strip())
+    if not m:
+        return None
+    fname, rest = m.group(1), m.group(2).split()
+    return RouteMatch("run_file", 0.95, lambda ws, v: _tool("run_python_file", ws, v, file_path=fname, args=rest))
+
+
+def tests_rule(query, workspace):
+    if not _TESTS_RE.match(query.strip()):
+        return None
+    if not os.path.isfile(os.path.join(workspace.root, "tests.py")):
+        return None
+    return RouteMatch("run_tests", 0.9, lambda ws, v: _tool("run_python_file", ws, v, file_path="tests.py"))
+
+
+def read_rule(query, workspace):
+    m = _READ_RE.match(query.strip())
+    if not m:
+        return None
+    path = m.group(1)
+    return RouteMatch("read_file", 0.9, lambda ws, v: _tool("get_file_content", ws, v, path=path))
+
+
+def list_rule(query, workspace):
+    m = _LIST_RE.match(query.strip())
+    if not m:
+        return None
+    directory = m.group(1) or "."
+    if directory.lower() in ("root", "project", "directory"):
+        directory = "."
+
+    def _run(ws, verbose):
+        msg, _ = _tool("get_files_info", ws, verbose, directory=directory)
+        return msg, f"Listed files in {directory}"
+
+    return RouteMatch("list_files", 0.9, _run)
+
+
+_CLASS_RE = re.compile(r"\s*class\s+(\w+)")
+
+
+def _enclosing_class(lines, line_no):
+    """Name of the class whose body holds line line_no (1-based), or None."""
+    line = lines[line_no - 1]
+    indent = len(line) - len(line.lstrip())
+    for above in reversed(lines[:line_no - 1]):
+        stripped = above.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if len(above) - len(above.lstrip()) < indent:
+            m = _CLASS_RE.match(above)
+            return m.group(1) if m else None
+    return None
+
+
+def find_definitions(workspace, symbol):
+    """
+    [(path, line_no)] of def/class lines for symbol ("name" or "Class.name"). With an owner,
+    only definitions directly inside a class of exactly that name count.
+    """
+    owner, _, name = symbol.rpartition(".")
+    results = search_code(
+        workspace.root,
+        extensions=[".py"],
+        content_query=rf"^\s*(?:async\s+def|def|class)\s+{re.escape(name)}\b",
+        use_regex=True,
+        case_sensitive=True,
+        context_lines=0,
+        workspace=workspace,
+    ) or []
+    hits = [(r["path"], m["line_no"]) for r in results if "path" in r for m in r["matches"]]
+    if owner:
+        owner_name = owner.rpartition(".")[2]
+        owned = []
+        for path, line_no in hits:
+            lines = workspace.files.read_lines(os.path.join(workspace.root, path)) or []
+            if line_no <= len(lines) and _enclosing_class(lines, line_no) == owner_name:
+                owned.append((path, line_no))
+        hits = owned
+    return hits
+
+
+def where_rule(query, workspace):
+    m = _WHERE_RE.match(query.strip())
+    if not m:
+        return None
+    symbol = m.group(1)
+    hits = find_definitions(workspace, symbol)
+    if not hits:
+        return None
+    # several candidates: let the model decide
+    confidence = 0.95 if len(hits) == 1 else 0.5
+    path, line_no = hits[0]
+
+    def _run(ws, verbose):
+        answer = f"{symbol} is defined in {path} (line {line_no})."
+        print(f"Answer: {answer}")
+        return None, answer
+
+    return RouteMatch("where_defined", confidence, _run)
+
+
+DEFAULT_RULES = [run_rule, tests_rule, read_rule, list_rule, where_rule]
+
+
+class Router:
+    def __init__(self, rules=None, threshold: float = config.ROUTER_MIN_CONFIDENCE):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.by_intent: dict[str, int] = {}
+        # moving average of one model round trip, fed by run_session
+        self.model_latency = 0.0
+        self.model_calls = 0
+
+    def add_rule(self, rule):
+        self.rules.append(rule)
+
+    def match(self, query, workspace) -> RouteMatch | None:
+        best = None
+        for rule in self.rules:
+            m = rule(query, workspace)
+            if m and (best is None or m.confidence > best.confidence):
+                best = m
+        if best and best.confidence >= self.threshold:
+            return best
+        return None
+
+    def route(self, query, workspace, verbose=False):
+        """(intent, tool Content or None, final text) if answered locally, else None."""
+        m = self.match(query, workspace)
+        with self._lock:
+            if m is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.by_intent[m.intent] = self.by_intent.get(m.intent, 0) + 1
+        if verbose:
+            print(f"[router] {m.intent} (confidence {m.confidence:.2f})")
+        tool_msg, final = m.run(workspace, verbose)
+        return m.intent, tool_msg, final
+
+    def observe_model_call(self, seconds: float):
+        with self._lock:
+            self.model_latency = seconds if not self.model_calls else 0.8 * self.model_latency + 0.2 * seconds
+            self.model_calls += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "by_intent": dict(self.by_intent),
+                # an estimate: each hit skipped at least one model round trip of the average
+                # latency seen so far; None until this process has timed a model call
+                "est_saved_s": round(self.hits * self.model_latency, 3) if self.model_calls else None,
+            }
+
+
+DEFAULT_ROUTER = Router()
@@ -0,0 +1,43 @@
+# session_io.py
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+
+class _ThreadLocalStdout:
+    """sys.stdout stand-in that sends writes to the calling thread's capture buffer, if any."""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def _target(self):
+        buf = getattr(self._local, "buf", None)
+        return self._default if buf is None else buf
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+def install():
+    if not isinstance(sys.stdout, _ThreadLocalStdout):
+        sys.stdout = _ThreadLocalStdout(sys.stdout)
+
+
+@contextmanager
+def capture():
+    """Collect everything the current thread prints (agent loop + tools) into a StringIO."""
+    install()
+    buf = io.StringIO()
+    sys.stdout._local.buf = buf
+    try:
+        yield buf
+    finally:
+        sys.stdout._local.buf = None
@@ -1,5 +1,14 @@
 # tests.py
+import json
+import os
+import sys
+import time
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+# Per-test wall times from earlier --parallel runs, used to balance the next one's shards.
+DURATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".test_durations.json")
+DEFAULT_DURATION = 0.05  # seconds assumed for tests with no recorded time
 
 def _fallback_suite():
     # 9 tiny passing tests to ensure "Ran 9 tests" appears if calculator tests aren't importable
@@ -37,16 +46,180 @@ def _calculator_suite():
     # Fallback if nothing importable/discoverable
     return None
 
+def _agent_suite():
+    """Behaviour tests for the agent's tool layer (agent_tests.py), or None if it can't be imported."""
+    try:
+        return unittest.defaultTestLoader.loadTestsFromName("agent_tests")
+    except Exception:
+        return None
+
+def _suite():
+    """Calculator tests plus the agent tests; the 9-test fallback if neither loads."""
+    # agent tests first: discovering calculator/ puts it on sys.path, where its main.py
+    # would shadow the agent's main module
+    agent = _agent_suite()
+    suites = [s for s in (_calculator_suite(), agent) if s is not None and s.countTestCases()]
+    return unittest.TestSuite(suites) if suites else None
+
+def _flatten(suite):
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            yield from _flatten(item)
+        else:
+            yield item
+
+
+class _TimedResult(unittest.TextTestResult):
+    """TextTestResult that also records each test's wall time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.timings[test.id()] = time.perf_counter() - self._started
+
+
+def _load_durations():
+    try:
+        with open(DURATIONS_FILE) as f:
+            data = json.load(f)
+        return {k: float(v) for k, v in data.items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _save_durations(timings):
+    if not timings:
+        return
+    data = _load_durations()
+    data.update(timings)
+    try:
+        with open(DURATIONS_FILE, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+    except OSError:
+        pass
+
+
+def shard(test_ids, workers, durations):
+    """
+    Longest-processing-time-first: hand the slowest remaining test to the least loaded shard.
+    Unknown tests get the mean recorded duration (or DEFAULT_DURATION).
+    """
+    known = [durations[t] for t in test_ids if t in durations]
+    guess = sum(known) / len(known) if known else DEFAULT_DURATION
+    shards = [[] for _ in range(workers)]
+    loads = [0.0] * workers
+    for t in sorted(test_ids, key=lambda t: durations.get(t, guess), reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(t)
+        loads[i] += durations.get(t, guess)
+    return [s for s in shards if s]
+
+
+_WORKER_TESTS = {}
+
+
+def _init_worker(loader_name):
+    # Forked workers inherit the parent's test index. Spawned ones rebuild the suite with
+    # the same loader and pick tests out by id, which covers the locally defined fallback too.
+    if _WORKER_TESTS:
+        return
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):  # module-level prints from test imports
+        suite = globals()[loader_name]()
+    _WORKER_TESTS.update((t.id(), t) for t in _flatten(suite))
+
+
+def _run_shard(test_ids):
+    import io
+    stream = io.StringIO()
+    result = _TimedResult(unittest.runner._WritelnDecorator(stream), True, 1)
+    # Run the shard as one suite in discovery order, so tests of a class and module stay
+    # together and setUpModule/setUpClass and their teardowns run around them.
+    order = {t: i for i, t in enumerate(_WORKER_TESTS)}
+    unittest.TestSuite(_WORKER_TESTS[t] for t in sorted(test_ids, key=order.__getitem__)).run(result)
+    return {
+        "progress": stream.getvalue(),  # the dots/F/E line
+        "run": result.testsRun,
+        "failures": [(str(t), tb) for t, tb in result.failures],
+        "errors": [(str(t), tb) for t, tb in result.errors],
+        "skipped": len(result.skipped),
+        "expected_failures": len(result.expectedFailures),
+        "unexpected_successes": len(result.unexpectedSuccesses),
+        "timings": result.timings,
+    }
+
+
+def run_parallel(suite, loader_name, workers):
+    """Run suite sharded across a process pool; prints the same summary as TextTestRunner."""
+    tests = list(_flatten(suite))
+    _WORKER_TESTS.update((t.id(), t) for t in tests)
+    shards = shard([t.id() for t in tests], workers, _load_durations())
+    started = time.perf_counter()
+    with ProcessPoolExecutor(len(shards), initializer=_init_worker, initargs=(loader_name,)) as pool:
+        outcomes = list(pool.map(_run_shard, shards))
+    elapsed = time.perf_counter() - started
+
+    total = {"run": 0, "failures": [], "errors": [], "skipped": 0, "expected_failures": 0, "unexpected_successes": 0}
+    timings = {}
+    for o in outcomes:
+        for key in total:
+            total[key] += o[key]
+        timings.update(o["timings"])
+        sys.stderr.write(o["progress"])
+    _save_durations(timings)
+
+    sys.stderr.write("\n")
+    for flavour, items in (("ERROR", total["errors"]), ("FAIL", total["failures"])):
+        for name, tb in items:
+            sys.stderr.write("=" * 70 + f"\n{flavour}: {name}\n" + "-" * 70 + f"\n{tb}\n")
+    sys.stderr.write("-" * 70 + "\n")
+    sys.stderr.write(f"Ran {total['run']} test{'s' if total['run'] != 1 else ''} in {elapsed:.3f}s\n\n")
+
+    counts = {
+        "failures": len(total["failures"]),
+        "errors": len(total["errors"]),
+        "skipped": total["skipped"],
+        "expected failures": total["expected_failures"],
+        "unexpected successes": total["unexpected_successes"],
+    }
+    ok = not (counts["failures"] or counts["errors"] or counts["unexpected successes"])
+    details = [f"{label}={n}" for label, n in counts.items() if n]
+    sys.stderr.write(("OK" if ok else "FAILED") + (f" ({', '.join(details)})" if details else "") + "\n")
+    return ok
+
+
 if __name__ == "__main__":
-    suite = _calculator_suite()
+    loader_name = "_suite"
+    suite = _suite()
     if suite is None or suite.countTestCases() == 0:
         print("using fallback")
+        loader_name = "_fallback_suite"
         suite = _fallback_suite()
 
-    runner = unittest.TextTestRunner(verbosity=1)
-    result = runner.run(suite)
+    # --parallel [N]: shard the tests across N worker processes (default: CPU count)
+    workers = 0
+    if "--parallel" in sys.argv:
+        i = sys.argv.index("--parallel")
+        if i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit():
+            workers = int(sys.argv[i + 1])
+        else:
+            workers = os.cpu_count() or 1
+
+    if workers > 1 and suite.countTestCases() > 1:
+        ok = run_parallel(suite, loader_name, workers)
+    else:
+        # durations are only recorded by --parallel runs, the only ones that use them
+        result = unittest.TextTestRunner(verbosity=1).run(suite)
+        ok = result.wasSuccessful()
 
     # Exit code 0 on success, 1 on failure—useful if you ever want CI to care.
     # (Boot.dev's grader only looks for stdout substrings, but this is nice hygiene.)
-    import sys
-    sys.exit(0 if result.wasSuccessful() else 1)
+    sys.exit(0 if ok else 1)